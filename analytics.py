@@ -0,0 +1,123 @@
+# analytics.py
+# Vue en colonnes (NumPy) de l'historique d'un joueur et stats vectorisées dessus :
+# winrate sur une fenêtre, clutch, prime time, matchups, upsets, forme glissante.
+# Les compteurs tenus à l'ingestion (Player.aggregates / rollups) restent la source des
+# stats all-time et des rapports (ils couvrent aussi ce qui dépasse MAX_GAMES) ; ceci sert aux
+# stats de /tekken_stats qui ont besoin de l'ordre des matchs (forme, 7 derniers jours glissants).
+from datetime import datetime
+from functools import lru_cache
+from operator import attrgetter
+import numpy as np
+from player import Player, TZ_PARIS
+
+RANK_INDEX = {rank: i for i, rank in enumerate(Player.RANK_TIERS_ORDER)}
+WIN, LOSS = 1, 0
+
+@lru_cache(maxsize=65536)
+def _paris_offset(hour: int) -> int:
+    # Décalage (s) de Europe/Paris pendant l'heure UTC `hour` (heures depuis l'epoch)
+    return int(datetime.fromtimestamp(hour * 3600, tz=TZ_PARIS).utcoffset().total_seconds())
+
+def local_hours(ts: np.ndarray) -> np.ndarray:
+    # Les changements d'heure tombent sur une heure UTC pile : un décalage par heure UTC distincte
+    hours, inverse = np.unique(ts // 3600, return_inverse=True)
+    offsets = np.fromiter((_paris_offset(int(h)) for h in hours), dtype=np.int64, count=len(hours))
+    return ((ts + offsets[inverse]) // 3600) % 24
+
+class Columns:
+    """Historique d'un joueur en tableaux NumPy, du plus ancien au plus récent.
+    Rounds absents et rangs inconnus valent -1 ; opp_char est un code, nom dans chars[code]."""
+    __slots__ = ("ts", "result", "my_rounds", "opp_rounds", "opp_rank", "opp_char", "chars", "hour")
+
+    def __init__(self, ts, result, my_rounds, opp_rounds, opp_rank, opp_char, chars):
+        self.ts = ts
+        self.result = result
+        self.my_rounds = my_rounds
+        self.opp_rounds = opp_rounds
+        self.opp_rank = opp_rank
+        self.opp_char = opp_char
+        self.chars = chars
+        self.hour = local_hours(ts)
+
+    def __len__(self):
+        return len(self.ts)
+
+    @classmethod
+    def from_games(cls, games):
+        # games : Game, du plus récent au plus ancien (ordre de Player.games)
+        games = games[::-1]
+        n = len(games)
+        codes = {}
+        def col(field, dtype, conv=None):
+            get = attrgetter(field)
+            values = map(get, games) if conv is None else (conv(get(g)) for g in games)
+            return np.fromiter(values, dtype=dtype, count=n)
+        return cls(
+            col("timestamp_unix", np.int64),
+            col("result_code", np.int8),
+            col("my_rounds", np.int8, lambda r: -1 if r is None else r),
+            col("opp_rounds", np.int8, lambda r: -1 if r is None else r),
+            col("opponent_rank", np.int8, lambda r: RANK_INDEX.get(r, -1)),
+            col("opponent_char", np.int16, lambda c: -1 if c is None else codes.setdefault(c, len(codes))),
+            list(codes),
+        )
+
+    def window(self, start_ts: float = None, end_ts: float = None) -> "Columns":
+        # Sous-vue [start_ts, end_ts[ (l'historique est trié : deux recherches dichotomiques)
+        lo = 0 if start_ts is None else int(np.searchsorted(self.ts, start_ts, side="left"))
+        hi = len(self.ts) if end_ts is None else int(np.searchsorted(self.ts, end_ts, side="left"))
+        view = Columns.__new__(Columns)
+        for f in ("ts", "result", "my_rounds", "opp_rounds", "opp_rank", "opp_char", "hour"):
+            setattr(view, f, getattr(self, f)[lo:hi])
+        view.chars = self.chars
+        return view
+
+def winrate(c: Columns):
+    # (victoires, matchs, winrate en %)
+    total = len(c)
+    wins = int(np.count_nonzero(c.result == WIN))
+    return wins, total, round(wins / total * 100, 1) if total else 0.0
+
+def clutch(c: Columns):
+    # Matchs décisifs (5 rounds) : (victoires, total)
+    mask = (c.my_rounds >= 0) & (c.my_rounds.astype(np.int16) + c.opp_rounds == 5)
+    return int(np.count_nonzero(mask & (c.result == WIN))), int(np.count_nonzero(mask))
+
+def close_losses(c: Columns) -> int:
+    loss = c.result == LOSS
+    return int(np.count_nonzero(loss & (((c.my_rounds == 2) & (c.opp_rounds == 3)) | ((c.my_rounds == 1) & (c.opp_rounds == 2)))))
+
+def prime_time(c: Columns) -> np.ndarray:
+    # Tranches de 6h (0 = nuit, 1 = matin, 2 = midi, 3 = soir) : tableau (4, 2) [victoires, matchs]
+    slot = c.hour // 6
+    return np.stack([np.bincount(slot, weights=c.result == WIN, minlength=4), np.bincount(slot, minlength=4)], axis=1).astype(np.int64)
+
+def matchups(c: Columns):
+    # {perso adverse: (victoires, matchs)}
+    known = c.opp_char >= 0
+    codes = c.opp_char[known]
+    totals = np.bincount(codes, minlength=len(c.chars))
+    wins = np.bincount(codes, weights=c.result[known] == WIN, minlength=len(c.chars))
+    return {c.chars[i]: (int(wins[i]), int(totals[i])) for i in np.flatnonzero(totals)}
+
+def upset_wins(c: Columns, my_rank: str) -> int:
+    # Victoires contre un rang strictement supérieur au rang actuel
+    my_idx = RANK_INDEX.get(my_rank, -1)
+    return int(np.count_nonzero((c.result == WIN) & (c.opp_rank > my_idx)))
+
+def rolling_form(c: Columns, n: int = 10) -> np.ndarray:
+    # Winrate (%) sur les n derniers matchs, après chaque match (len(c) - n + 1 valeurs)
+    if len(c) < n: return np.empty(0)
+    wins = np.concatenate(([0], np.cumsum(c.result == WIN)))
+    return (wins[n:] - wins[:-n]) * (100.0 / n)
+
+# Colonnes gardées par joueur tant que son historique ne change pas
+_cache = {}
+
+def columns(p) -> Columns:
+    games = p.games
+    key = (len(games), games[0].uid if games else None, games[-1].uid if games else None)
+    cached = _cache.get(p.name)
+    if cached is None or cached[0] != key:
+        cached = _cache[p.name] = (key, Columns.from_games(games))
+    return cached[1]
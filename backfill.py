@@ -0,0 +1,152 @@
+# backfill.py
+# Backfill de l'historique : parcourt les pages anciennes des profils Wavu / EWGF (au-delà de la première
+# page et des MAX_GAMES matchs gardés en mémoire) et les écrit directement dans la base SQLite.
+# Une seule page en mémoire à la fois ; un checkpoint par joueur / site permet de reprendre après un arrêt.
+#
+#   python backfill.py                          -> tous les joueurs de config.py
+#   python backfill.py --players Alice Bob --max-pages 50
+#   python backfill.py --reset                  -> ignore le checkpoint et repart de la page 2
+#
+# À lancer bot arrêté (même base que le bot) : les compteurs all-time sont recalculés depuis la base à la fin.
+import argparse
+import asyncio
+import json
+import os
+import time
+from contextlib import nullcontext
+import config
+from config import CACHE_FILE
+from data_fetcher import html_digest, join_games, _run_parser, MERGE_TOLERANCE
+from http_client import CircuitOpenError, retry_after
+from storage import atomic_write
+
+# URL d'une page d'historique ({url} = URL du profil dans PLAYERS, {page} à partir de 2)
+BACKFILL_PAGE_URLS = getattr(config, "BACKFILL_PAGE_URLS", {"wavu": "{url}?page={page}", "ewgf": "{url}?page={page}"})
+# Au plus une page toutes les BACKFILL_DELAY secondes par site, et BACKFILL_MAX_PAGES pages par site et par lancement
+BACKFILL_DELAY = getattr(config, "BACKFILL_DELAY", 2.0)
+BACKFILL_MAX_PAGES = getattr(config, "BACKFILL_MAX_PAGES", 200)
+# Réponses 429 tolérées d'affilée (on attend le Retry-After, sinon BACKFILL_RETRY_AFTER secondes)
+BACKFILL_RETRIES = getattr(config, "BACKFILL_RETRIES", 3)
+BACKFILL_RETRY_AFTER = getattr(config, "BACKFILL_RETRY_AFTER", 60)
+BACKFILL_CHECKPOINT = getattr(config, "BACKFILL_CHECKPOINT", os.path.join(os.path.dirname(CACHE_FILE) or ".", "backfill.json"))
+
+class BackfillInterrupted(Exception):
+    """Page impossible à récupérer : le checkpoint pointe dessus, le prochain lancement reprend là."""
+
+class Pacer:
+    """Espace les requêtes d'un même site (en plus du HostLimiter et des retries du client HTTP)."""
+
+    def __init__(self, delay: float):
+        self.delay = delay
+        self._next = {}
+
+    async def wait(self, source: str):
+        # Réserve le prochain créneau du site puis attend son heure
+        now = time.monotonic()
+        slot = max(now, self._next.get(source, 0))
+        self._next[source] = slot + self.delay
+        if slot > now: await asyncio.sleep(slot - now)
+
+    def hold(self, source: str, seconds: float):
+        # Le site demande de ralentir (429) : plus rien avant `seconds`
+        self._next[source] = max(self._next.get(source, 0), time.monotonic() + seconds)
+
+async def _fetch_page(http, url, source, limiter, pacer):
+    for _ in range(BACKFILL_RETRIES + 1):
+        await pacer.wait(source)
+        try:
+            async with (limiter.limit(url) if limiter is not None else nullcontext()):
+                status, headers, text = await http.get(url, headers={"User-Agent": "Mozilla/5.0"}, source=source)
+        except CircuitOpenError as e:
+            raise BackfillInterrupted(str(e))
+        except Exception as e:
+            raise BackfillInterrupted(f"{url}: {type(e).__name__} {e}")
+        if status == 200: return text
+        if status != 429: raise BackfillInterrupted(f"HTTP {status} sur {url}")
+        wait = retry_after(headers)
+        pacer.hold(source, BACKFILL_RETRY_AFTER if wait is None else wait)
+    raise BackfillInterrupted(f"{url} : toujours limité (429) après {BACKFILL_RETRIES} essais")
+
+async def iter_history_pages(http, source, url, start_page=2, limiter=None, pacer=None, max_pages=BACKFILL_MAX_PAGES):
+    """Pages d'historique d'un profil, de la plus récente à la plus ancienne : (numéro, matchs).
+    S'arrête sur une page vide, sur une page identique à la précédente (site qui ignore le paramètre)
+    ou après max_pages pages. Lève BackfillInterrupted si une page ne peut pas être récupérée."""
+    pacer = pacer or Pacer(BACKFILL_DELAY)
+    template = BACKFILL_PAGE_URLS[source]
+    last_digest = None
+    for page in range(start_page, start_page + max_pages):
+        html = await _fetch_page(http, template.format(url=url, page=page), source, limiter, pacer)
+        digest = html_digest(html)
+        if digest == last_digest: return
+        last_digest = digest
+        games = (await _run_parser(source, html, None))[1]
+        if not games: return
+        yield page, games
+
+def store_page(store, name, games, tolerance=MERGE_TOLERANCE) -> int:
+    # Dédup contre la base (match déjà importé par l'autre site ou par le refresh), même jointure que la fusion
+    lo = min(g.timestamp_unix for g in games) - tolerance
+    hi = max(g.timestamp_unix for g in games) + tolerance
+    _, fresh, _, _ = join_games(store.games_between(name, lo, hi), games, tolerance)
+    return store.add_history(name, fresh) if fresh else 0
+
+def load_checkpoint(path=BACKFILL_CHECKPOINT):
+    # {joueur: {site: {"next_page": n, "done": bool, "added": n}}}
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+    except ValueError as e:
+        print(f"Checkpoint backfill illisible ({e}) : on repart de zéro")
+        return {}
+
+def save_checkpoint(checkpoint, path=BACKFILL_CHECKPOINT):
+    atomic_write(path, json.dumps(checkpoint, indent=1, sort_keys=True))
+
+async def backfill_player(http, store, name, urls, checkpoint, checkpoint_file=BACKFILL_CHECKPOINT, limiter=None,
+                          pacer=None, max_pages=BACKFILL_MAX_PAGES, tolerance=MERGE_TOLERANCE) -> int:
+    """Importe l'historique ancien d'un joueur dans le store (SqliteStore). Renvoie le nombre de matchs ajoutés.
+    Le checkpoint est avancé et écrit après chaque page."""
+    pacer = pacer or Pacer(BACKFILL_DELAY)
+    state = checkpoint.setdefault(name, {})
+    added = 0
+    # EWGF d'abord : prioritaire à la fusion, les pages Wavu ne font que compléter les trous
+    for source in ("ewgf", "wavu"):
+        url = urls.get(source)
+        if not url: continue
+        cp = state.setdefault(source, {"next_page": 2, "done": False, "added": 0})
+        if cp["done"]: continue
+        start = cp["next_page"]
+        async for page, games in iter_history_pages(http, source, url, start, limiter, pacer, max_pages):
+            n = await asyncio.to_thread(store_page, store, name, games, tolerance)
+            cp["next_page"] = page + 1
+            cp["added"] += n
+            added += n
+            save_checkpoint(checkpoint, checkpoint_file)
+            print(f"Backfill {name} [{source}] page {page} : {len(games)} matchs, {n} nouveaux")
+        # Fin de l'historique atteinte avant la limite de pages : plus rien à faire pour ce site
+        if cp["next_page"] < start + max_pages:
+            cp["done"] = True
+            save_checkpoint(checkpoint, checkpoint_file)
+    return added
+
+async def main():
+    parser = argparse.ArgumentParser(description="Backfill de l'historique Wavu / EWGF dans la base SQLite")
+    parser.add_argument("--players", nargs="*", help="joueurs à traiter (défaut : tous)")
+    parser.add_argument("--max-pages", type=int, default=BACKFILL_MAX_PAGES, help="pages max par site et par joueur")
+    parser.add_argument("--reset", action="store_true", help="ignore le checkpoint")
+    args = parser.parse_args()
+
+    from player_manager import PlayerManager
+    pm = PlayerManager(storage_backend="sqlite")
+    try:
+        added = await pm.backfill(args.players, max_pages=args.max_pages, reset=args.reset)
+        for name, n in added.items():
+            p = pm.players[name]
+            print(f"{name} : {n} matchs ajoutés • all-time {p.aggregates.total} games ({p.aggregates.winrate}%)")
+    finally:
+        await pm.close()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,100 @@
+# benchmarks/bench_analytics.py
+# Stats d'un joueur (/tekken_stats + weekly report) : anciennes boucles Python sur les matchs,
+# moteur en colonnes NumPy (analytics.py) et compteurs tenus à l'ingestion (Player.aggregates / rollups).
+#
+#   python benchmarks/bench_analytics.py                       -> 500, 1500 et 10000 matchs
+#   python benchmarks/bench_analytics.py --sizes 1500 --repeat 20
+import argparse
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import analytics
+from data_fetcher import Game
+from player import Player, Aggregates, Rollups, TZ_PARIS
+from sample_pages import make_games
+
+def build_games(n):
+    # Du plus récent au plus ancien, comme Player.games
+    return [Game(g["ts"], int(g["me"] > g["op"]), g["me"], g["op"], g["opp"], 1,
+                 opponent_char=g["opp_char"], opponent_rank=g["opp_rank"], my_char=g["my_char"]) for g in make_games(n)]
+
+# Anciennes boucles de full_stats et generate_weekly_report, gardées ici comme référence
+def legacy_stats(games, my_rank, week_ago_ts):
+    wins = sum(1 for g in games if g['result'] == 'WIN')
+    clutch_wins = clutch_total = 0
+    for g in games:
+        parts = g['score'].split('-')
+        if len(parts) == 2 and (int(parts[0]) + int(parts[1]) == 5):
+            clutch_total += 1
+            if g['result'] == 'WIN': clutch_wins += 1
+    slots = [[0, 0] for _ in range(4)]
+    for g in games:
+        h = datetime.fromtimestamp(g['timestamp_unix'], tz=TZ_PARIS).hour
+        slots[h // 6][1] += 1
+        if g['result'] == 'WIN': slots[h // 6][0] += 1
+    week_games = [g for g in games if g['timestamp_unix'] > week_ago_ts]
+    close_losses = higher_rank_wins = 0
+    opp_stats = {}
+    my_idx = Player.RANK_TIERS_ORDER.index(my_rank)
+    for g in week_games:
+        if g['result'] == 'LOSS' and g['score'] in ["2-3", "1-2"]: close_losses += 1
+        if g['result'] == 'WIN' and g.get('opponent_rank') in Player.RANK_TIERS_ORDER:
+            if Player.RANK_TIERS_ORDER.index(g['opponent_rank']) > my_idx: higher_rank_wins += 1
+        char = g.get('opponent_char')
+        if char:
+            s = opp_stats.setdefault(char, {'wins': 0, 'total': 0})
+            s['total'] += 1
+            if g['result'] == 'WIN': s['wins'] += 1
+    return wins, clutch_total, slots, close_losses, higher_rank_wins, len(opp_stats)
+
+def columnar_stats(cols, my_rank, week_ago_ts):
+    week = cols.window(week_ago_ts)
+    return (analytics.winrate(cols)[0], analytics.clutch(cols)[1], analytics.prime_time(cols),
+            analytics.close_losses(week), analytics.upset_wins(week, my_rank), len(analytics.matchups(week)))
+
+def counter_stats(agg, rollups, my_rank, first_day, last_day):
+    week = rollups.window(first_day, last_day)
+    my_idx = Player.RANK_TIERS_ORDER.index(my_rank)
+    upsets = sum(n for rank, n in week["ranks"].items() if rank in analytics.RANK_INDEX and analytics.RANK_INDEX[rank] > my_idx)
+    return agg.wins, agg.clutch_total, agg.slots, week["close_losses"], upsets, len(week["chars"])
+
+def best_of(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        out = fn()
+        best = min(best, time.perf_counter() - start)
+    return out, best
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark stats joueur : boucles vs NumPy vs compteurs")
+    parser.add_argument("--sizes", default="500,1500,10000")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    my_rank = "Tenryu"
+    print(f"{'matchs':>7} {'boucles':>10} {'colonnes':>10} {'numpy':>10} {'compteurs':>10}")
+    for n in (int(s) for s in args.sizes.split(",")):
+        games = build_games(n)
+        newest = datetime.fromtimestamp(games[0].timestamp_unix, tz=TZ_PARIS)
+        last_day = newest.date()
+        first_day = last_day - timedelta(days=6)
+        week_ago_ts = TZ_PARIS.localize(datetime(first_day.year, first_day.month, first_day.day)).timestamp()
+        Rollups.KEEP_DAYS = 3650
+        agg, rollups = Aggregates.from_games(games), Rollups.from_games(games)
+
+        legacy, legacy_s = best_of(lambda: legacy_stats(games, my_rank, week_ago_ts), args.repeat)
+        cols, build_s = best_of(lambda: analytics.Columns.from_games(games), args.repeat)
+        columnar, numpy_s = best_of(lambda: columnar_stats(cols, my_rank, week_ago_ts), args.repeat)
+        counters, counter_s = best_of(lambda: counter_stats(agg, rollups, my_rank, first_day, last_day), args.repeat)
+        assert legacy[:2] == columnar[:2] == counters[:2] and legacy[3:] == columnar[3:] == counters[3:]
+        assert legacy[2] == columnar[2].tolist() == counters[2]
+        print(f"{n:>7} {legacy_s * 1000:8.2f}ms {build_s * 1000:8.2f}ms {numpy_s * 1000:8.2f}ms {counter_s * 1000:8.3f}ms")
+    print("\ncolonnes = construction des tableaux (une fois par changement d'historique, gardée en cache)")
+
+if __name__ == "__main__":
+    main()
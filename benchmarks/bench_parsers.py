@@ -0,0 +1,142 @@
+# benchmarks/bench_parsers.py
+# Compare les backends du parser Wavu sur des pages enregistrées,
+# et mesure l'extraction JSON EWGF (temps + taille du payload).
+#
+#   python benchmarks/bench_parsers.py                 -> pages de benchmarks/pages/wavu*.html / ewgf*.html (ou synthétiques)
+#   python benchmarks/bench_parsers.py page1.html ...  -> pages Wavu données
+#
+# Aucune page réelle n'est versionnée : sans elles, la comparaison OK / DIFFERENT ne porte que sur
+# le balisage synthétique de sample_pages.py. Pour en enregistrer une (anonymisée) :
+#   python benchmarks/bench_parsers.py --capture wavu https://wank.wavu.wiki/player/XXXX --name "MonPseudo"
+#   python benchmarks/bench_parsers.py --capture ewgf https://www.ewgf.gg/player/XXXX --name "MonPseudo"
+# La page est écrite dans benchmarks/pages/<source>_<n>.html, avec le pseudo donné et chaque adversaire
+# trouvé par le parser remplacés par "Me" / "Opp N" dans les seuls champs de pseudo ; si le nombre de
+# matchs parsés change après coup, rien n'est écrit.
+# Les identifiants (polarisId, liens de profil) restent : à relire avant de committer une page.
+import argparse
+import asyncio
+import glob
+import json
+import os
+import re
+import sys
+import time
+from html import unescape
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data_fetcher import WAVU_PARSERS, EWGF_EXTRACT_STATS, parse_ewgf_html, parse_wavu_html
+from http_client import HttpClient
+from sample_pages import make_games, make_wavu_page, make_ewgf_page
+
+PAGES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "pages")
+
+def load_pages(paths, prefix="wavu", make_page=make_wavu_page):
+    if not paths: paths = sorted(glob.glob(os.path.join(PAGES_DIR, f"{prefix}*.html")))
+    pages = []
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            pages.append((os.path.basename(path), f.read()))
+    if not pages:
+        print(f"Aucune page {prefix} dans {PAGES_DIR} : pages synthétiques (voir --capture)")
+        for n in (50, 500):
+            pages.append((f"synthetic_{prefix}_{n}", make_page(make_games(n))))
+    return pages
+
+def bench(fn, html, repeat=5):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(html)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+# Wavu : texte du lien d'un élément .player (pseudo lu par le parser) et titre <h1> du profil
+WAVU_NAME_RE = re.compile(r'(class="[^"]*player[^"]*"[^>]*>\s*<a\b[^>]*>|<h1\b[^>]*>)([^<]+)(<)', re.I)
+# EWGF : valeur d'un champ de pseudo du JSON, en clair ou dans la chaîne JS échappée du payload Next.js
+# (un niveau d'échappement de plus : \" autour des chaînes, \\ devant les séquences JSON)
+EWGF_NAME_RES = (
+    (re.compile(r'("(?:p1Name|p2Name|name)"\s*:\s*")((?:[^"\\]|\\.)*)(")'), 1),
+    (re.compile(r'(\\"(?:p1Name|p2Name|name)\\"\s*:\s*\\")((?:[^"\\]|\\\\(?:\\"|\\\\|[^"\\]))*)(\\")'), 2),
+)
+
+def _anonymize_wavu(html, mapping):
+    def field(m):
+        value = m.group(2)
+        new = mapping.get(unescape(value).strip())
+        return m.group(0) if new is None else m.group(1) + value.replace(value.strip(), new) + m.group(3)
+    return WAVU_NAME_RE.sub(field, html)
+
+def _anonymize_ewgf(html, mapping):
+    def field(m, levels):
+        value = m.group(2)
+        try:
+            for _ in range(levels): value = json.loads(f'"{value}"')
+        except ValueError:
+            return m.group(0)
+        new = mapping.get(value)
+        return m.group(0) if new is None else m.group(1) + new + m.group(3)
+    for pattern, levels in EWGF_NAME_RES:
+        html = pattern.sub(lambda m: field(m, levels), html)
+    return html
+
+def anonymize(source, html, name=None):
+    # Remplace le pseudo du joueur et les adversaires trouvés par le parser, uniquement là où le parser
+    # les lit : liens .player et <h1> (Wavu), champs de pseudo du JSON (EWGF). Attributs, scripts et reste du texte intacts.
+    parse = parse_wavu_html if source == "wavu" else parse_ewgf_html
+    opponents = sorted({g.opponent for g in parse(html)[1] if g.opponent})
+    mapping = {opp: f"Opp {i + 1}" for i, opp in enumerate(opponents)}
+    if name: mapping[name] = "Me"
+    if not mapping: return html
+    return (_anonymize_wavu if source == "wavu" else _anonymize_ewgf)(html, mapping)
+
+async def capture(source, url, name=None):
+    http = HttpClient()
+    try:
+        status, _, html = await http.get(url, headers={"User-Agent": "Mozilla/5.0"}, source=source)
+    finally:
+        await http.close()
+    if status != 200: sys.exit(f"HTTP {status} sur {url}")
+    parse = parse_wavu_html if source == "wavu" else parse_ewgf_html
+    before = len(parse(html)[1])
+    html = anonymize(source, html, name)
+    after = len(parse(html)[1])
+    # Anonymisation qui casse le parsing : la page ne mesurerait plus la même chose, rien n'est écrit
+    if after != before: sys.exit(f"{before} matchs avant anonymisation, {after} après : page non enregistrée")
+    os.makedirs(PAGES_DIR, exist_ok=True)
+    path = os.path.join(PAGES_DIR, f"{source}_{len(glob.glob(os.path.join(PAGES_DIR, f'{source}*.html'))) + 1}.html")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(html)
+    print(f"{path} : {after} matchs")
+
+def main():
+    if sys.argv[1:2] == ["--capture"]:
+        parser = argparse.ArgumentParser(description="Enregistre une page Wavu / EWGF anonymisée dans benchmarks/pages")
+        parser.add_argument("--capture", nargs=2, metavar=("SOURCE", "URL"), required=True)
+        parser.add_argument("--name", help="pseudo du joueur, remplacé par 'Me'")
+        args = parser.parse_args()
+        source, url = args.capture
+        if source not in ("wavu", "ewgf"): sys.exit("SOURCE : wavu ou ewgf")
+        return asyncio.run(capture(source, url, args.name))
+
+    pages = load_pages(sys.argv[1:])
+    ref_name = "html5lib"
+    for page_name, html in pages:
+        ref = WAVU_PARSERS[ref_name](html)
+        print(f"\n{page_name} ({len(html) / 1024:.0f} KB, {len(ref[1])} games)")
+        ref_time = bench(WAVU_PARSERS[ref_name], html)
+        for name, fn in WAVU_PARSERS.items():
+            same = "OK" if fn(html) == ref else "DIFFERENT"
+            t = bench(fn, html) if name != ref_name else ref_time
+            print(f"  {name:<10} {t * 1000:8.2f} ms   x{ref_time / t:5.1f}   {same}")
+
+    if sys.argv[1:]: return
+    for page_name, html in load_pages([], "ewgf", make_ewgf_page):
+        t = bench(parse_ewgf_html, html)
+        games = parse_ewgf_html(html)[1]
+        print(f"\n{page_name} ({len(html) / 1024:.0f} KB, {len(games)} games)")
+        print(f"  parse_ewgf_html {t * 1000:8.2f} ms   extraction {EWGF_EXTRACT_STATS['last_ms']:.2f} ms   "
+              f"payload {EWGF_EXTRACT_STATS['last_payload_bytes'] / 1024:.0f} KB")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+# benchmarks/bench_refresh.py
+# Benchmark de bout en bout de PlayerManager.update_all contre le faux serveur (fixture_server.py).
+#
+#   python benchmarks/bench_refresh.py                          -> 1, 10, 100 et 500 joueurs
+#   python benchmarks/bench_refresh.py --sizes 10,100 --cycles 8 --latency 0.2 --error-rate 0.02
+#
+# Chaque taille tourne dans son propre process (pic mémoire propre). Le temps CPU est découpé en
+# parse / merge / add_games / _save_cache (mesurés dans le thread qui les exécute), le reste
+# (requêtes HTTP, event loop) est compté dans "fetch".
+import argparse
+import asyncio
+import functools
+import json
+import os
+import resource
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import types
+from collections import defaultdict
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, ROOT_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+RESULT_MARKER = "BENCH_RESULT "
+
+def percentile(values, pct):
+    if not values: return 0.0
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[idx]
+
+# ---------------------
+# WORKER (un process par taille de roster)
+# ---------------------
+def _ensure_config(cache_file):
+    # Le vrai config.py contient le token Discord : s'il n'existe pas, on en fournit un minimal
+    try:
+        import config  # noqa: F401
+    except ImportError:
+        cfg = types.ModuleType("config")
+        cfg.PLAYERS = {}
+        cfg.CACHE_FILE = cache_file
+        sys.modules["config"] = cfg
+
+def _install_cpu_timers(cpu):
+    import data_fetcher
+    import player
+    import player_manager
+    lock = threading.Lock()
+
+    def cpu_timed(bucket, fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            t0 = time.thread_time()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                elapsed = time.thread_time() - t0
+                with lock: cpu[bucket] += elapsed
+        return wrapper
+
+    data_fetcher.parse_wavu_html = cpu_timed("parse", data_fetcher.parse_wavu_html)
+    data_fetcher.parse_ewgf_html = cpu_timed("parse", data_fetcher.parse_ewgf_html)
+    data_fetcher.merge_games = cpu_timed("merge", data_fetcher.merge_games)
+    player.Player.add_games = cpu_timed("add_games", player.Player.add_games)
+    player_manager.PlayerManager._snapshot = cpu_timed("save_cache", player_manager.PlayerManager._snapshot)
+    player_manager.PlayerManager._write = cpu_timed("save_cache", player_manager.PlayerManager._write)
+
+async def _run_worker(args):
+    tmp_dir = tempfile.mkdtemp(prefix="tekken_bench_")
+    cache_file = os.path.join(tmp_dir, "cache.json")
+    _ensure_config(cache_file)
+    cpu = defaultdict(float)
+    _install_cpu_timers(cpu)
+
+    from player_manager import PlayerManager
+    from fixture_server import player_urls
+
+    pm = PlayerManager(players=player_urls(args.base_url, args.players), cache_file=cache_file)
+    cycles = []
+    cpu_total = 0.0
+    events = 0
+    try:
+        for i in range(args.cycles):
+            if i: await asyncio.sleep(args.interval)
+            cpu_start = time.process_time()
+            wall_start = time.perf_counter()
+            events += len(await pm.update_all())
+            # Sauvegarde à chaque cycle (pas de debounce) : pire cas pour le disque
+            await pm.flush()
+            cycles.append(time.perf_counter() - wall_start)
+            cpu_total += time.process_time() - cpu_start
+    finally:
+        await pm.close()
+
+    measured = sum(cpu.values())
+    split = {"fetch": max(0.0, cpu_total - measured)}
+    split.update({k: cpu[k] for k in ("parse", "merge", "add_games", "save_cache")})
+    result = {
+        "players": args.players,
+        "cycles": cycles,
+        "events": events,
+        "cpu": split,
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "cache_kb": os.path.getsize(cache_file) / 1024 if os.path.exists(cache_file) else 0,
+    }
+    print(RESULT_MARKER + json.dumps(result))
+
+# ---------------------
+# DRIVER
+# ---------------------
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def _wait_port(port, timeout=15):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.5): return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError("Le serveur de fixtures ne répond pas")
+
+def _print_result(r):
+    cycles = r["cycles"]
+    cpu = r["cpu"]
+    total_cpu = sum(cpu.values()) or 1.0
+    print(f"\n== {r['players']} joueur(s) : {len(cycles)} cycles, {r['events']} events")
+    print(f"  cycle    p50 {percentile(cycles, 50):7.3f}s   p90 {percentile(cycles, 90):7.3f}s   "
+          f"p99 {percentile(cycles, 99):7.3f}s   (1er cycle {cycles[0]:.3f}s)")
+    print("  cpu      " + "   ".join(f"{k} {v:.3f}s ({v / total_cpu:.0%})" for k, v in cpu.items()))
+    print(f"  mémoire  pic RSS {r['peak_rss_mb']:.1f} MB   cache {r['cache_kb']:.0f} KB")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark refresh PlayerManager")
+    parser.add_argument("--sizes", default="1,10,100,500")
+    parser.add_argument("--cycles", type=int, default=5)
+    parser.add_argument("--interval", type=float, default=1.0, help="pause entre deux cycles (s)")
+    parser.add_argument("--latency", type=float, default=0.1)
+    parser.add_argument("--latency-jitter", type=float, default=0.03)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--match-every", type=float, default=2.0)
+    parser.add_argument("--games", type=int, default=100)
+    parser.add_argument("--no-etag", action="store_true")
+    # Mode interne : un worker par taille
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--players", type=int, default=1, help=argparse.SUPPRESS)
+    parser.add_argument("--base-url", default="", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        asyncio.run(_run_worker(args))
+        return
+
+    port = _free_port()
+    server_cmd = [sys.executable, os.path.join(BENCH_DIR, "fixture_server.py"), "--port", str(port),
+                  "--games", str(args.games), "--latency", str(args.latency),
+                  "--latency-jitter", str(args.latency_jitter), "--error-rate", str(args.error_rate),
+                  "--match-every", str(args.match_every)]
+    if args.no_etag: server_cmd.append("--no-etag")
+    server = subprocess.Popen(server_cmd)
+    try:
+        _wait_port(port)
+        for size in [int(x) for x in args.sizes.split(",") if x]:
+            cmd = [sys.executable, os.path.abspath(__file__), "--worker", "--players", str(size),
+                   "--base-url", f"http://127.0.0.1:{port}", "--cycles", str(args.cycles),
+                   "--interval", str(args.interval)]
+            out = subprocess.run(cmd, capture_output=True, text=True, cwd=ROOT_DIR)
+            lines = [l for l in out.stdout.splitlines() if l.startswith(RESULT_MARKER)]
+            if not lines:
+                print(f"\n== {size} joueur(s) : échec\n{out.stdout[-2000:]}{out.stderr[-2000:]}")
+                continue
+            _print_result(json.loads(lines[-1][len(RESULT_MARKER):]))
+    finally:
+        server.terminate()
+        server.wait()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+# benchmarks/bench_serialization.py
+# Sauvegarde / chargement du cache joueurs : ancien format (deepcopy + json indent=2 + __dict__.update)
+# contre le schéma v2 de Player (to_dict sans copie, from_dict validé + chaînes internées),
+# et le démarrage lazy du JsonStore (historique décodé au premier accès).
+#
+#   python benchmarks/bench_serialization.py                    -> 50 joueurs x 1500 matchs
+#   python benchmarks/bench_serialization.py --players 10 --games 500
+import argparse
+import copy
+import gc
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data_fetcher import Game, parse_ewgf_html
+from player import Player, game_uid
+from storage import JsonStore
+from sample_pages import make_games, make_ewgf_page
+
+def build_players(n_players, n_games):
+    players = {}
+    for i in range(n_players):
+        name = f"P{i:03d}"
+        _, games, main_char, matchups, pentagon = parse_ewgf_html(make_ewgf_page(make_games(n_games, seed=i), player_name=name))
+        p = Player(name)
+        p.update_stats("Tenryu", 1234.5, main_char, matchups, pentagon)
+        p.add_games(games)
+        players[name] = p
+    return players
+
+# Ancienne implémentation, gardée ici comme référence
+def legacy_dump(players):
+    data = {}
+    for name, p in players.items():
+        d = copy.deepcopy({k: v for k, v in p.__dict__.items() if not k.startswith("_") and k not in ("pending_games", "dirty", "dedup", "aggregates", "rollups")})
+        d["games"] = [g.to_dict() for g in p.games]
+        d["seen_game_ids"] = [game_uid(g) for g in p.games]
+        data[name] = d
+    return json.dumps(data, indent=2)
+
+def legacy_load(text):
+    players = {}
+    for name, d in json.loads(text).items():
+        p = Player(d["name"])
+        games = d.pop("games", [])
+        p.__dict__.update(d)
+        p.games = games
+        p.__dict__["seen_game_ids"] = set(d.get("seen_game_ids", []))
+        players[name] = p
+    return players
+
+def dump(players):
+    return json.dumps({name: p.to_dict() for name, p in players.items()})
+
+def load(text):
+    return {name: Player.from_dict(d) for name, d in json.loads(text).items()}
+
+def lazy_dump(players):
+    return JsonStore(os.devnull).snapshot(players, set(players))
+
+def lazy_load(path):
+    # Démarrage lazy : seules les lignes résumé sont décodées
+    return JsonStore(path).load(None)
+
+def bytes_per_game(games):
+    # Mémoire d'un match en dict (ancien format) vs Game (slots), chaînes partagées non comptées
+    out = {}
+    for label, build in (("dict", lambda g: g.to_dict()), ("Game", lambda g: Game.from_row(g.to_row()))):
+        gc.collect()
+        tracemalloc.start()
+        kept = [build(g) for g in games]
+        current, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        out[label] = current / len(kept)
+    return out
+
+def measure(fn, arg, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        out = fn(arg)
+        best = min(best, time.perf_counter() - start)
+    gc.collect()
+    tracemalloc.start()
+    kept = fn(arg)
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return out, best, peak, current, kept
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark sérialisation Player")
+    parser.add_argument("--players", type=int, default=50)
+    parser.add_argument("--games", type=int, default=1500)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    players = build_players(args.players, args.games)
+    print(f"{args.players} joueurs x {args.games} matchs")
+    print(f"{'':10} {'save':>9} {'pic save':>10} {'load':>9} {'pic load':>10} {'retenu load':>12} {'taille':>9}")
+    tmp_path = os.path.join(tempfile.mkdtemp(prefix="tekken_bench_"), "cache.json")
+    def to_file(text):
+        with open(tmp_path, "w") as f: f.write(text)
+        return tmp_path
+
+    runs = (
+        ("legacy", legacy_dump, legacy_load, str),
+        ("v2", dump, load, str),
+        ("v2 lazy", lazy_dump, lazy_load, to_file),
+    )
+    for label, dump_fn, load_fn, load_arg in runs:
+        text, save_s, save_peak, _, _ = measure(dump_fn, players, args.repeat)
+        loaded, load_s, load_peak, load_kept, _ = measure(load_fn, load_arg(text), args.repeat)
+        print(f"{label:10} {save_s * 1000:7.0f}ms {save_peak / 2**20:8.1f}MB {load_s * 1000:7.0f}ms "
+              f"{load_peak / 2**20:8.1f}MB {load_kept / 2**20:10.1f}MB {len(text) / 2**20:7.1f}MB")
+        assert {n: len(p.games) for n, p in loaded.items()} == {n: len(p.games) for n, p in players.items()}
+
+    per_game = bytes_per_game([g for p in players.values() for g in p.games])
+    print(f"\nmémoire par match : dict {per_game['dict']:.0f} o, Game {per_game['Game']:.0f} o")
+
+if __name__ == "__main__":
+    main()
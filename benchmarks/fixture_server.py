@@ -0,0 +1,156 @@
+# benchmarks/fixture_server.py
+# Faux Wavu / EWGF en local pour mesurer le refresh sans toucher aux vrais sites.
+#
+#   python benchmarks/fixture_server.py --port 8765 --latency 0.15 --error-rate 0.02 --match-every 120
+#
+# Routes : /wavu/<joueur> et /ewgf/<joueur>. Sert benchmarks/pages/wavu*.html / ewgf*.html s'ils existent,
+# sinon des pages synthétiques par joueur, qui reçoivent un nouveau match toutes les --match-every secondes.
+# ?page=N (N >= 2) : pages d'historique plus anciennes, --history-pages au total, puis des pages vides (backfill.py).
+import argparse
+import asyncio
+import glob
+import hashlib
+import os
+import random
+import sys
+import time
+import zlib
+
+from aiohttp import web
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from sample_pages import make_games, make_wavu_page, make_ewgf_page, CHARS, RANKS
+
+PAGES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "pages")
+
+class FixtureState:
+    def __init__(self, games_per_page=100, latency=0.0, latency_jitter=0.0, error_rate=0.0,
+                 match_every=0.0, etag=True, seed=0, history_pages=0):
+        self.games_per_page = games_per_page
+        self.history_pages = history_pages
+        self.latency = latency
+        self.latency_jitter = latency_jitter
+        self.error_rate = error_rate
+        self.match_every = match_every
+        self.etag = etag
+        self.rnd = random.Random(seed)
+        self.started = time.time()
+        self.players = {}
+        self.recorded = {}
+        for source in ("wavu", "ewgf"):
+            paths = sorted(glob.glob(os.path.join(PAGES_DIR, f"{source}*.html")))
+            if paths:
+                with open(paths[0], encoding="utf-8") as f:
+                    self.recorded[source] = f.read()
+        self.requests = 0
+        self.errors = 0
+        self.not_modified = 0
+
+    def _player(self, name):
+        state = self.players.get(name)
+        if state is None:
+            seed = zlib.crc32(name.encode())
+            # L'historique s'arrête au démarrage du serveur, les nouveaux matchs arrivent ensuite
+            games = make_games(self.games_per_page, newest_ts=int(self.started) - 60, seed=seed)
+            state = self.players[name] = {"games": games, "rnd": random.Random(seed), "last_synth": self.started,
+                                          "pages": {}, "history": []}
+        return state
+
+    def _history_page(self, state, name, page):
+        # Pages figées (les nouveaux matchs n'y apparaissent pas) : chacune commence sous la précédente
+        history = state["history"]
+        while len(history) < page - 1:
+            oldest = (history[-1] if history else state["games"])[-1]["ts"]
+            history.append(make_games(self.games_per_page, newest_ts=oldest - 600,
+                                      seed=zlib.crc32(f"{name}/{len(history) + 2}".encode())))
+        return history[page - 2]
+
+    def _synthesize(self, state, now):
+        if not self.match_every: return
+        rnd = state["rnd"]
+        # Décalage par joueur pour que tout le monde ne joue pas au même moment
+        while now - state["last_synth"] >= self.match_every * rnd.uniform(0.5, 1.5):
+            state["last_synth"] += self.match_every
+            me = rnd.randint(0, 3)
+            op = 3 if me < 3 else rnd.randint(0, 2)
+            if rnd.random() < 0.5: me, op = op, me
+            ts = max(int(state["last_synth"]), state["games"][0]["ts"] + 1)
+            state["games"].insert(0, {"ts": ts, "me": me, "op": op, "opp": f"Opp {rnd.randint(1, 40)}",
+                                      "opp_char": rnd.choice(CHARS), "my_char": rnd.choice(CHARS),
+                                      "opp_rank": rnd.choice(RANKS)})
+            del state["games"][self.games_per_page:]
+            state["pages"].clear()
+
+    def page(self, source, name, page=1):
+        if source in self.recorded: return self.recorded[source] if page == 1 else ""
+        state = self._player(name)
+        if page > 1:
+            make = make_wavu_page if source == "wavu" else make_ewgf_page
+            games = self._history_page(state, name, page) if page <= self.history_pages else []
+            return make(games, player_name=name)
+        self._synthesize(state, time.time())
+        html = state["pages"].get(source)
+        if html is None:
+            make = make_wavu_page if source == "wavu" else make_ewgf_page
+            html = state["pages"][source] = make(state["games"], player_name=name)
+        return html
+
+async def handle(request):
+    fx: FixtureState = request.app["fixture"]
+    fx.requests += 1
+    source, name = request.match_info["source"], request.match_info["name"]
+    if fx.latency or fx.latency_jitter:
+        await asyncio.sleep(max(0.0, fx.rnd.gauss(fx.latency, fx.latency_jitter)))
+    if fx.error_rate and fx.rnd.random() < fx.error_rate:
+        fx.errors += 1
+        return web.Response(status=503, text="injected error")
+    if source not in ("wavu", "ewgf"): raise web.HTTPNotFound()
+
+    try:
+        page = int(request.query.get("page", 1))
+    except ValueError:
+        raise web.HTTPBadRequest()
+    html = fx.page(source, name, page)
+    headers = {}
+    if fx.etag:
+        etag = '"' + hashlib.md5(html.encode()).hexdigest() + '"'
+        if request.headers.get("If-None-Match") == etag:
+            fx.not_modified += 1
+            return web.Response(status=304, headers={"ETag": etag})
+        headers["ETag"] = etag
+    return web.Response(text=html, content_type="text/html", headers=headers)
+
+async def handle_stats(request):
+    fx: FixtureState = request.app["fixture"]
+    return web.json_response({"requests": fx.requests, "errors": fx.errors, "not_modified": fx.not_modified,
+                              "players": len(fx.players)})
+
+def make_app(state: FixtureState) -> web.Application:
+    app = web.Application()
+    app["fixture"] = state
+    app.router.add_get("/_stats", handle_stats)
+    app.router.add_get("/{source}/{name}", handle)
+    return app
+
+def player_urls(base_url: str, count: int):
+    return {f"P{i:03d}": {"wavu": f"{base_url}/wavu/p{i:03d}", "ewgf": f"{base_url}/ewgf/p{i:03d}"}
+            for i in range(count)}
+
+def main():
+    parser = argparse.ArgumentParser(description="Faux serveur Wavu/EWGF")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--games", type=int, default=100, help="matchs par page")
+    parser.add_argument("--latency", type=float, default=0.0, help="latence moyenne (s)")
+    parser.add_argument("--latency-jitter", type=float, default=0.0, help="écart-type de la latence (s)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="proportion de réponses 503")
+    parser.add_argument("--match-every", type=float, default=0.0, help="un nouveau match toutes les N s par joueur")
+    parser.add_argument("--no-etag", action="store_true", help="pas d'ETag (force le fallback par hash)")
+    parser.add_argument("--history-pages", type=int, default=0, help="pages d'historique servies avec ?page=N")
+    args = parser.parse_args()
+    state = FixtureState(args.games, args.latency, args.latency_jitter, args.error_rate, args.match_every,
+                         etag=not args.no_etag, history_pages=args.history_pages)
+    web.run_app(make_app(state), host=args.host, port=args.port, print=None)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+# benchmarks/sample_pages.py
+# Pages Wavu / EWGF synthétiques, avec la même structure que les vraies pages de profil.
+# Utilisées quand aucune page enregistrée n'est disponible.
+import json
+import random
+from datetime import datetime, timezone
+
+CHARS = ["Jin", "Kazuya", "King", "Paul", "Law", "Lili", "Reina", "Dragunov", "Jun", "Hwoarang"]
+RANKS = ["Garyu", "Shinryu", "Tenryu", "Mighty Ruler", "Flame Ruler", "Battle Ruler"]
+
+def make_games(n: int, newest_ts: int = 1_760_000_000, seed: int = 1):
+    """Liste de matchs du plus récent au plus ancien (même ordre que sur les sites)."""
+    rnd = random.Random(seed)
+    games = []
+    ts = newest_ts
+    for _ in range(n):
+        me = rnd.randint(0, 3)
+        op = 3 if me < 3 else rnd.randint(0, 2)
+        if rnd.random() < 0.5: me, op = op, me
+        games.append({
+            "ts": ts,
+            "me": me,
+            "op": op,
+            "opp": f"Opp {rnd.randint(1, 40)}",
+            "opp_char": rnd.choice(CHARS),
+            "my_char": rnd.choice(CHARS),
+            "opp_rank": rnd.choice(RANKS),
+        })
+        ts -= rnd.randint(120, 900)
+    return games
+
+def make_wavu_page(games, player_name: str = "Me", rating: str = "1,234.5") -> str:
+    rows = "".join(
+        f'<tr><td><script>printDateTime({g["ts"]})</script></td>'
+        f'<td><span class="player"><a href="/player/me">{player_name}</a></span> <span class="char">{g["my_char"]}</span></td>'
+        f'<td>{g["me"]}-{g["op"]}</td>'
+        f'<td><span class="player"><a href="/player/opp">{g["opp"]}</a></span> <span class="char">{g["opp_char"]}</span></td>'
+        f'<td class="rating">+{g["me"] * 3}</td></tr>'
+        for g in games
+    )
+    return (
+        '<!DOCTYPE html><html><head><title>Wavu Wank</title></head><body>'
+        f'<h1>{player_name}</h1><div class="rating"><span class="mu">{rating}</span></div>'
+        f'<table><tr><th>When</th><th>Player</th><th>Score</th><th>Opponent</th><th>Rating</th></tr>{rows}</table>'
+        '</body></html>'
+    )
+
+def make_ewgf_page(games, player_name: str = "Me", rank: str = "Tenryu", main_char: str = "Jin") -> str:
+    battles = []
+    for g in games:
+        battles.append({
+            "battleType": "RANKED_BATTLE",
+            "p1PolarisId": "ME", "p2PolarisId": "OPP",
+            "p1Name": player_name, "p2Name": g["opp"],
+            "p1Char": g["my_char"], "p2Char": g["opp_char"],
+            "p1DanRank": rank, "p2DanRank": g["opp_rank"],
+            "p1RoundsWon": g["me"], "p2RoundsWon": g["op"],
+            "winner": 1 if g["me"] > g["op"] else 2,
+            "battleAt": datetime.fromtimestamp(g["ts"], timezone.utc).isoformat().replace("+00:00", "Z"),
+        })
+    stats = {
+        "playerMetadata": {"polarisId": "ME", "name": player_name},
+        "mainChar": {main_char: {"count": len(games)}},
+        "playedCharacters": {main_char: {"RANKED_BATTLE": {"allTimeMatchups": {
+            c: {"winRate": 50.0, "totalMatches": 10, "wins": 5, "losses": 5} for c in CHARS
+        }}}},
+        "statPentagonData": {
+            "attackComponents": {"aggressiveness": 14, "heavyDamage": 12},
+            "defenseComponents": {"block": 10, "throwEscape": 8},
+            "spiritComponents": {"comeback": 11, "closeBattles": 13},
+        },
+        "battles": battles,
+    }
+    # Next.js : le payload est une chaîne JS échappée dans self.__next_f.push
+    flight = '7:["$","div",null,{"playerStats":' + json.dumps(stats) + '}]\n'
+    head_chunk = '1:HL["/_next/static/css/app.css","style"]\n'
+    return (
+        '<!DOCTYPE html><html><head><title>EWGF</title></head><body>'
+        f'<img alt="{rank} rank icon" src="/static/rank-icons/{rank.replace(" ", "")}T8.webp"/>'
+        f'<script>self.__next_f.push([1,{json.dumps(head_chunk)}])</script>'
+        f'<script>self.__next_f.push([1,{json.dumps(flight)}])</script>'
+        '</body></html>'
+    )
@@ -21,7 +21,7 @@ def create_weekly_graph(players_data):
     """
     players_data = {
         "Pseudo": [(timestamp, 'WIN'), (timestamp, 'LOSS'), ...],
-        "Pseudo2": ...
+        "Pseudo2": [(timestamp, +2), (timestamp, -1), ...],  # ou victoires - défaites par tranche (rollups)
     }
     """
     # Utiliser le style sombre pour Discord
@@ -50,7 +50,9 @@ def create_weekly_graph(players_data):
             dt = datetime.fromtimestamp(ts)
             dates.append(dt)
             
-            if result == 'WIN':
+            if isinstance(result, int):
+                current_score += result
+            elif result == 'WIN':
                 current_score += 1
             else:
                 current_score -= 1
@@ -1,227 +1,888 @@
 import re
+import json
+import time
 import asyncio
+import hashlib
+import os
+import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from collections import OrderedDict
+from functools import lru_cache
+from operator import attrgetter
+from contextlib import asynccontextmanager
 from typing import Tuple, List, Dict, Optional
 from datetime import datetime
+from urllib.parse import urlparse
+from html.parser import HTMLParser
+from html import unescape
 from bs4 import BeautifulSoup
-import aiohttp
+from http_client import HttpClient, CircuitOpenError
+from metrics import REGISTRY
+
+# Renvoyé par fetch_html quand la page n'a pas changé depuis le dernier passage
+NOT_MODIFIED = object()
+
+FETCH_SECONDS = REGISTRY.histogram("tekken_fetch_seconds", "Durée des requêtes Wavu/EWGF (retries compris)")
+FETCH_ERRORS = REGISTRY.counter("tekken_fetch_errors_total", "Fetchs en échec après retries")
+FETCH_SKIPPED = REGISTRY.counter("tekken_fetch_circuit_open_total", "Fetchs sautés car circuit ouvert")
+FETCH_NOT_MODIFIED = REGISTRY.counter("tekken_fetch_not_modified_total", "Pages inchangées (304 ou même hash)")
+PARSE_SECONDS = REGISTRY.histogram("tekken_parse_seconds", "Durée du parsing d'une page (hors cache)")
+MERGE_SECONDS = REGISTRY.histogram("tekken_merge_seconds", "Durée de la fusion Wavu/EWGF")
+MERGE_GAMES = REGISTRY.counter("tekken_merge_games_total", "Matchs passés par la fusion Wavu/EWGF, par résultat de jointure")
+# joined = présent sur les deux sites (dont skewed = timestamps différents), *_only = un seul site
+MERGE_OUTCOMES = ("joined", "skewed", "ewgf_only", "wavu_only")
+# Écart max (secondes) entre les timestamps EWGF et Wavu d'un même match
+MERGE_TOLERANCE = 60
 
 async def _dummy_coro():
     await asyncio.sleep(0)
     return None
 
+# ---------------------
+# GAME
+# ---------------------
+RESULTS = ("LOSS", "WIN", "UNKNOWN")
+RESULT_CODES = {r: i for i, r in enumerate(RESULTS)}
+SOURCES = ("wavu", "ewgf")
+SOURCE_CODES = {s: i for i, s in enumerate(SOURCES)}
+_intern = sys.intern
+
+def _intern_opt(v):
+    return _intern(v) if type(v) is str else v
+
+class Game:
+    """Un match. Slots + petits entiers (résultat, source, rounds) au lieu d'un dict de chaînes ;
+    garde l'interface d'un dict en lecture (g['score'], g.get('opponent_rank')) pour les embeds et rapports."""
+    # Ordre des colonnes de to_row() / from_row() (cache, journal, workers)
+    ROW_FIELDS = ("timestamp_unix", "timestamp_iso", "result_code", "my_rounds", "opp_rounds",
+                  "opponent", "opponent_char", "opponent_rank", "my_char", "source_code")
+    __slots__ = ROW_FIELDS + ("_uid",)
+    # Clés exposées comme un dict : champs stockés + champs calculés
+    KEYS = ("timestamp_unix", "timestamp_iso", "result", "score", "opponent", "opponent_char",
+            "opponent_rank", "my_char", "source")
+
+    def __init__(self, timestamp_unix, result_code, my_rounds, opp_rounds, opponent, source_code,
+                 timestamp_iso=None, opponent_char=None, opponent_rank=None, my_char=None):
+        self.timestamp_unix = timestamp_unix
+        self.timestamp_iso = timestamp_iso
+        self.result_code = result_code
+        self.my_rounds = my_rounds
+        self.opp_rounds = opp_rounds
+        # Adversaire absent de la page (battle EWGF sans nom) : "" pour que l'uid reste calculable
+        self.opponent = _intern(opponent) if type(opponent) is str else ""
+        self.opponent_char = _intern_opt(opponent_char)
+        self.opponent_rank = _intern_opt(opponent_rank)
+        self.my_char = _intern_opt(my_char)
+        self.source_code = source_code
+        self._uid = None
+
+    @property
+    def uid(self) -> str:
+        # Calculé une seule fois par match (dédup, fusion, stockage)
+        if self._uid is None: self._uid = game_uid(self)
+        return self._uid
+
+    @property
+    def result(self) -> str:
+        return RESULTS[self.result_code]
+
+    @property
+    def score(self) -> str:
+        return f"{self.my_rounds}-{self.opp_rounds}" if self.my_rounds is not None else ""
+
+    @property
+    def source(self) -> str:
+        return SOURCES[self.source_code]
+
+    # --- Interface dict ---
+    def __getitem__(self, key):
+        if key in self.KEYS: return getattr(self, key)
+        raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        if key == "result": self.result_code = RESULT_CODES[value]
+        elif key == "source": self.source_code = SOURCE_CODES[value]
+        elif key == "score": self.my_rounds, self.opp_rounds = parse_score(value)
+        elif key in self.ROW_FIELDS: setattr(self, key, _intern_opt(value))
+        else: raise KeyError(key)
+        if key in ("timestamp_unix", "opponent", "score"): self._uid = None
+
+    def get(self, key, default=None):
+        value = getattr(self, key, None) if key in self.KEYS else None
+        return default if value is None else value
+
+    def __contains__(self, key):
+        return key in self.KEYS and getattr(self, key) is not None
+
+    def keys(self):
+        return [k for k in self.KEYS if getattr(self, k) is not None]
+
+    def to_dict(self) -> Dict:
+        d = {k: getattr(self, k) for k in self.keys()}
+        d.setdefault("opponent_rank", None)
+        return d
+
+    def to_row(self) -> list:
+        return [getattr(self, f) for f in self.ROW_FIELDS]
+
+    def copy(self) -> "Game":
+        g = Game.__new__(Game)
+        for f in self.__slots__: setattr(g, f, getattr(self, f))
+        return g
+
+    @classmethod
+    def from_row(cls, row):
+        ts, iso, result_code, my_r, opp_r, opponent, opp_char, opp_rank, my_char, source_code = row
+        return cls(ts, result_code, my_r, opp_r, opponent, source_code, iso, opp_char, opp_rank, my_char)
+
+    @classmethod
+    def from_dict(cls, d):
+        my_r, opp_r = parse_score(d.get("score"))
+        return cls(
+            int(d["timestamp_unix"]), RESULT_CODES.get(d.get("result"), 2), my_r, opp_r, d.get("opponent"),
+            SOURCE_CODES.get(d.get("source"), 0), d.get("timestamp_iso"), d.get("opponent_char"),
+            d.get("opponent_rank"), d.get("my_char"),
+        )
+
+    def __eq__(self, other):
+        if not isinstance(other, Game): return NotImplemented
+        return self.to_row() == other.to_row()
+
+    def __repr__(self):
+        return f"Game({self.to_dict()!r})"
+
+NON_WORD_RE = re.compile(r'\W+')
+
+@lru_cache(maxsize=4096)
+def normalize_name(name: str) -> str:
+    # Les mêmes adversaires reviennent à chaque page : normalisation mise en cache (None -> "")
+    return NON_WORD_RE.sub('', name).lower() if name else ""
+
+def game_uid(g) -> str:
+    # Identifiant d'un match : timestamp + adversaire normalisé + score
+    return f"{g['timestamp_unix']}_{normalize_name(g['opponent'])}_{g['score']}"
+
+def parse_score(score):
+    # "3-1" -> (3, 1) ; score absent ou illisible -> (None, None)
+    try:
+        my_r, opp_r = score.split("-")
+        return int(my_r), int(opp_r)
+    except (AttributeError, ValueError):
+        return None, None
+
 # ---------------------
 # WAVU PARSER
 # ---------------------
-def parse_wavu_html(html: str, expected_player_name: str = "") -> Tuple[Optional[float], List[Dict]]:
+WAVU_TS_RE = re.compile(r'printDateTime\((\d+)\)')
+MU_CLEAN_RE = re.compile(r"[^\d\.]")
+
+def _wavu_rating(mu_text: Optional[str]) -> Optional[float]:
+    if mu_text is None: return None
+    try:
+        text = MU_CLEAN_RE.sub("", mu_text.strip())
+        if text: return float(text)
+    except: pass
+    return None
+
+def _wavu_ts(td0_raw: str) -> int:
+    ts_match = WAVU_TS_RE.search(td0_raw)
+    return int(ts_match.group(1)) if ts_match else 0
+
+def _wavu_game(timestamp_unix: int, left_char: str, right_player: str, result_text: str) -> Game:
+    # Construction commune aux deux backends : les matchs produits sont strictement identiques
+    p_score, o_score = parse_score(result_text)
+    if p_score is not None:
+        result = 1 if p_score > o_score else 0
+    else:
+        result = 2
+    return Game(timestamp_unix, result, p_score, o_score, right_player, 0, my_char=left_char)
+
+def _parse_wavu_html5lib(html: str, since_ts: Optional[int] = None) -> Tuple[Optional[float], List[Game]]:
     soup = BeautifulSoup(html, "html5lib")
-    rating_mu = None
     mu_elem = soup.select_one(".mu")
-    if mu_elem:
-        try:
-            text = re.sub(r"[^\d\.]", "", mu_elem.text.strip())
-            if text: rating_mu = float(text)
-        except: pass
+    rating_mu = _wavu_rating(mu_elem.text) if mu_elem else None
 
     games = []
     rows = soup.select("table tr")
     for row in rows:
         tds = row.find_all("td")
         if len(tds) < 4: continue
+        timestamp_unix = _wavu_ts(str(tds[0]))
+        # Les matchs sont du plus récent au plus ancien : on s'arrête au premier déjà connu.
+        # Ligne sans date (printDateTime absent) : ignorée, elle ne dit rien de la position du watermark
+        if since_ts is not None:
+            if not timestamp_unix: continue
+            if timestamp_unix <= since_ts: break
         try:
-            ts_match = re.search(r'printDateTime\((\d+)\)', str(tds[0]))
-            timestamp_unix = int(ts_match.group(1)) if ts_match else 0
-            
             left_char = tds[1].select_one(".char").text.strip() if tds[1].select_one(".char") else ""
             right_player = tds[3].select_one(".player a").text.strip() if tds[3].select_one(".player a") else ""
-            result_text = tds[2].text.strip()
-            
-            my_char = left_char
-            opponent = right_player
-            
-            score_parts = result_text.split('-')
-            if len(score_parts) == 2:
-                p_score, o_score = int(score_parts[0]), int(score_parts[1])
-                result = "WIN" if p_score > o_score else "LOSS"
-            else:
-                result = "UNKNOWN"
-
-            games.append({
-                "timestamp_unix": timestamp_unix,
-                "result": result,
-                "score": result_text,
-                "opponent": opponent,
-                "opponent_rank": None,
-                "my_char": my_char,
-                "source": "wavu"
-            })
+            games.append(_wavu_game(timestamp_unix, left_char, right_player, tds[2].text.strip()))
         except Exception: continue
     return rating_mu, games
 
+class _WavuRowExtractor(HTMLParser):
+    """Extracteur en streaming des lignes de tableau Wavu (pas de DOM).
+
+    Pour chaque <td> d'une ligne de <table>, on garde le HTML brut utile (pour printDateTime),
+    le texte, le texte du premier élément .char et celui du premier lien dans un .player.
+    """
+    VOID_TAGS = {"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "source", "track", "wbr"}
+
+    def __init__(self, since_ts: Optional[int] = None):
+        super().__init__(convert_charrefs=True)
+        self.since_ts = since_ts
+        self.reached_known = False  # True dès qu'on tombe sur un match plus vieux que le watermark
+        self.stack: List[Tuple[str, List[str]]] = []
+        self.table_depth = 0
+        self.row: Optional[List[Dict]] = None
+        self.cell: Optional[Dict] = None
+        self.rows: List[List[Dict]] = []
+        self.mu_text: Optional[str] = None
+        self._mu_depth: Optional[int] = None
+        self._mu_parts: List[str] = []
+
+    def _close_cell(self):
+        if self.cell is not None and self.row is not None:
+            self.row.append(self.cell)
+        self.cell = None
+
+    def _close_row(self):
+        self._close_cell()
+        row, self.row = self.row, None
+        if row is None or self.reached_known: return
+        if len(row) >= 4:
+            row[0]["ts"] = _wavu_ts("".join(row[0]["raw"]))
+            if self.since_ts is not None:
+                # Ligne sans date : ignorée (même règle que _parse_wavu_html5lib)
+                if not row[0]["ts"]: return
+                if row[0]["ts"] <= self.since_ts:
+                    self.reached_known = True
+                    return
+        self.rows.append(row)
+
+    def handle_starttag(self, tag, attrs):
+        classes = []
+        for k, v in attrs:
+            if k == "class" and v: classes = v.split()
+
+        if tag == "tr" and self.table_depth:
+            self._close_row()
+            self.row = []
+        elif tag == "td" and self.row is not None:
+            self._close_cell()
+            self.cell = {"raw": [], "text": [], "char": None, "char_depth": None, "link": None, "link_depth": None}
+
+        cell = self.cell
+        if cell is not None:
+            cell["raw"].append(self.get_starttag_text() or "")
+
+        if tag in self.VOID_TAGS: return
+        self.stack.append((tag, classes))
+        depth = len(self.stack)
+        if tag == "table": self.table_depth += 1
+
+        if self.mu_text is None and self._mu_depth is None and "mu" in classes:
+            self._mu_depth = depth
+        if cell is not None:
+            if cell["char"] is None and cell["char_depth"] is None and tag != "td" and "char" in classes:
+                cell["char_depth"] = depth
+                cell["char_parts"] = []
+            if cell["link"] is None and cell["link_depth"] is None and tag == "a" \
+                    and any("player" in c for _, c in self.stack[:-1]):
+                cell["link_depth"] = depth
+                cell["link_parts"] = []
+
+    def handle_startendtag(self, tag, attrs):
+        if self.cell is not None: self.cell["raw"].append(self.get_starttag_text() or "")
+
+    def handle_endtag(self, tag):
+        if not any(t == tag for t, _ in self.stack): return
+        while self.stack:
+            depth = len(self.stack)
+            t, _ = self.stack.pop()
+            cell = self.cell
+            if cell is not None:
+                if cell["char_depth"] == depth:
+                    cell["char"] = "".join(cell.pop("char_parts")).strip()
+                    cell["char_depth"] = -1
+                if cell["link_depth"] == depth:
+                    cell["link"] = "".join(cell.pop("link_parts")).strip()
+                    cell["link_depth"] = -1
+            if self._mu_depth == depth:
+                self.mu_text = "".join(self._mu_parts)
+                self._mu_depth = None
+            if t == "td": self._close_cell()
+            elif t == "tr": self._close_row()
+            elif t == "table":
+                self.table_depth -= 1
+                if not self.table_depth: self._close_row()
+            if t == tag: break
+
+    def handle_data(self, data):
+        if self._mu_depth is not None: self._mu_parts.append(data)
+        cell = self.cell
+        if cell is None: return
+        cell["raw"].append(data)
+        cell["text"].append(data)
+        if "char_parts" in cell: cell["char_parts"].append(data)
+        if "link_parts" in cell: cell["link_parts"].append(data)
+
+WAVU_FEED_CHUNK = 16384
+
+def _parse_wavu_stream(html: str, since_ts: Optional[int] = None) -> Tuple[Optional[float], List[Game]]:
+    extractor = _WavuRowExtractor(since_ts)
+    if since_ts is None:
+        extractor.feed(html)
+    else:
+        # Par morceaux, pour arrêter la lecture dès qu'on atteint les matchs déjà vus
+        for i in range(0, len(html), WAVU_FEED_CHUNK):
+            extractor.feed(html[i:i + WAVU_FEED_CHUNK])
+            if extractor.reached_known: break
+    if not extractor.reached_known:
+        extractor.close()
+        extractor._close_row()
+    if extractor._mu_depth is not None: extractor.mu_text = "".join(extractor._mu_parts)
+
+    games = []
+    for tds in extractor.rows:
+        if len(tds) < 4: continue
+        try:
+            left_char = tds[1]["char"] or ""
+            right_player = tds[3]["link"] or ""
+            games.append(_wavu_game(tds[0]["ts"], left_char, right_player, "".join(tds[2]["text"]).strip()))
+        except Exception: continue
+    return _wavu_rating(extractor.mu_text), games
+
+# Backends disponibles pour parser Wavu. "stream" est le plus rapide, "html5lib" reste le filet de sécurité.
+WAVU_PARSERS = {
+    "stream": _parse_wavu_stream,
+    "html5lib": _parse_wavu_html5lib,
+}
+WAVU_PARSER_BACKEND = "stream"
+
+def parse_wavu_html(html: str, expected_player_name: str = "", backend: Optional[str] = None,
+                    since_ts: Optional[int] = None) -> Tuple[Optional[float], List[Game]]:
+    """since_ts : watermark, on s'arrête au premier match <= since_ts. None = parsing complet."""
+    backend = backend or WAVU_PARSER_BACKEND
+    if backend != "html5lib":
+        try:
+            return WAVU_PARSERS[backend](html, since_ts)
+        except Exception as e:
+            print(f"Wavu parser '{backend}' error, fallback html5lib: {e}")
+    return _parse_wavu_html5lib(html, since_ts)
+
 # ---------------------
 # EWGF PARSER
 # ---------------------
-def parse_ewgf_html(html: str) -> Tuple[Optional[str], List[Dict], Optional[str], Optional[Dict], Optional[Dict]]:
-    soup = BeautifulSoup(html, "html5lib")
+EWGF_RANK_RE = re.compile(r'<img\b[^>]*\balt=["\']([^"\']*?) rank icon["\']', re.I)
+EWGF_MAIN_CHAR_RE = re.compile(r'\\?"mainChar\\?":\s*\{\\?"([^"\\]+)')
+NEXT_PUSH_MARKER = "self.__next_f.push("
+
+_json_decoder = json.JSONDecoder()
+
+# Stats de la dernière extraction EWGF (temps, taille du payload décodé)
+EWGF_EXTRACT_STATS = {"calls": 0, "last_ms": 0.0, "total_ms": 0.0, "last_payload_bytes": 0, "last_blocks": 0}
+
+def _decode_object_at(text: str, pos: int):
+    """Décode l'objet JSON qui suit la position pos (après la clé playerStats). Renvoie (dict, taille) ou (None, 0)."""
+    start = text.find('{', pos)
+    if start == -1: return None, 0
+    try:
+        obj, end = _json_decoder.raw_decode(text, start)
+    except ValueError:
+        return None, 0
+    return (obj, end - start) if isinstance(obj, dict) else (None, 0)
+
+def _iter_player_stats_blocks(html: str):
+    """Parcourt les objets playerStats du HTML brut, dans l'ordre de la page. Produit (dict, taille)."""
+    decoded_chunks = {}
+    pos = html.find("playerStats")
+    while pos != -1:
+        after = pos + len("playerStats")
+        if html.startswith('\\"', after):
+            # Payload Next.js : la clé est dans une chaîne JS échappée -> on décode la chaîne entière
+            push = html.rfind(NEXT_PUSH_MARKER, 0, pos)
+            chunk = None
+            if push != -1:
+                chunk = decoded_chunks.get(push)
+                if chunk is None:
+                    try:
+                        arr, arr_end = _json_decoder.raw_decode(html, push + len(NEXT_PUSH_MARKER))
+                        chunk = next((x for x in arr if isinstance(x, str)), "")
+                        decoded_chunks[push] = chunk
+                    except ValueError:
+                        chunk = None
+            if chunk is not None:
+                inner = chunk.find('"playerStats"')
+                while inner != -1:
+                    obj, size = _decode_object_at(chunk, inner + len('"playerStats"'))
+                    if obj is not None: yield obj, size
+                    inner = chunk.find('"playerStats"', inner + 1)
+                # On saute les autres occurrences de ce même chunk (déjà décodées)
+                next_script = html.find("</script>", pos)
+                pos = html.find("playerStats", next_script if next_script != -1 else after)
+                continue
+            # Échappement inconnu : on ne désescape que le script courant
+            script_end = html.find("</script>", pos)
+            segment = html[after:script_end if script_end != -1 else len(html)].replace('\\"', '"')
+            obj, size = _decode_object_at(segment, 0)
+        else:
+            obj, size = _decode_object_at(html, after)
+        if obj is not None: yield obj, size
+        pos = html.find("playerStats", after)
+
+def extract_ewgf_player_stats(html: str):
+    """Liste des blocs playerStats jusqu'au premier qui contient à la fois battles et statPentagonData."""
+    t0 = time.perf_counter()
+    blocks = []
+    payload_bytes = 0
+    for obj, size in _iter_player_stats_blocks(html):
+        blocks.append(obj)
+        payload_bytes += size
+        if obj.get("battles") and obj.get("statPentagonData"):
+            break
+    elapsed_ms = (time.perf_counter() - t0) * 1000
+    EWGF_EXTRACT_STATS["calls"] += 1
+    EWGF_EXTRACT_STATS["last_ms"] = round(elapsed_ms, 3)
+    EWGF_EXTRACT_STATS["total_ms"] += elapsed_ms
+    EWGF_EXTRACT_STATS["last_payload_bytes"] = payload_bytes
+    EWGF_EXTRACT_STATS["last_blocks"] = len(blocks)
+    return blocks
+
+def _ewgf_games(data: Dict, since_ts: Optional[int] = None) -> List[Game]:
+    games = []
+    viewer_pid = data.get("playerMetadata", {}).get("polarisId")
+    for b in data.get("battles", []):
+        if b.get("battleType") != "RANKED_BATTLE": continue
+        
+        if b.get("p1PolarisId") == viewer_pid:
+            ws, my, op = 1, "p1", "p2"
+        elif b.get("p2PolarisId") == viewer_pid:
+            ws, my, op = 2, "p2", "p1"
+        else: continue
+
+        r_won = b.get(f"{my}RoundsWon")
+        r_lost = b.get(f"{op}RoundsWon")
+        # Score partiel (un seul des deux rounds connu) : traité comme absent, comme parse_score
+        if r_won is None or r_lost is None: r_won = r_lost = None
+        ts_str = b.get("battleAt")
+        ts_unix = 0
+        if ts_str:
+            dt = datetime.fromisoformat(ts_str.replace("Z", "+00:00"))
+            ts_unix = int(dt.timestamp())
+        # Battles du plus récent au plus ancien : tout ce qui suit est déjà connu (battle sans date ignorée)
+        if since_ts is not None:
+            if not ts_unix: continue
+            if ts_unix <= since_ts: break
+
+        games.append(Game(
+            ts_unix, 1 if b.get("winner") == ws else 0, r_won, r_lost, b.get(f"{op}Name"), 1,
+            timestamp_iso=ts_str, opponent_char=b.get(f"{op}Char"), opponent_rank=b.get(f"{op}DanRank"),
+            my_char=b.get(f"{my}Char"),
+        ))
+    return games
+
+def parse_ewgf_html(html: str, since_ts: Optional[int] = None) -> Tuple[Optional[str], List[Game], Optional[str], Optional[Dict], Optional[Dict]]:
     rank = None
     main_char = None
     games = []
     matchups = {}
     pentagon = {}
 
-    # 1. Rang et Main Character
-    rank_img = soup.find("img", alt=re.compile(r" rank icon$", re.I))
-    if rank_img:
-        rank = rank_img["alt"].replace(" rank icon", "").strip()
+    # 1. Rang et Main Character (regex directement sur le HTML, pas de DOM)
+    rank_match = EWGF_RANK_RE.search(html)
+    if rank_match:
+        rank = unescape(rank_match.group(1)).strip()
 
-    try:
-        char_match = re.search(r'\\?"mainChar\\?":\s*\{\\?"([^"\\]+)', html)
-        if char_match:
-            main_char = char_match.group(1)
-    except Exception as e:
-        print(f"Error regex main_char: {e}")
+    char_match = EWGF_MAIN_CHAR_RE.search(html)
+    if char_match:
+        main_char = char_match.group(1)
 
-    # 2. EXTRACTION JSON ROBUSTE
-    scripts = soup.find_all("script")
-    
-    for s in scripts:
-        if s.string and 'playerStats' in s.string:
-            txt = s.string
-            idx = txt.find("playerStats")
-            if idx == -1: continue
-            
-            start = txt.find('{', idx)
-            if start == -1: continue
-            
-            balance = 0
-            end = -1
-            for i in range(start, len(txt)):
-                if txt[i] == '{': balance += 1
-                elif txt[i] == '}': balance -= 1
-                
-                if balance == 0:
-                    end = i + 1
-                    break
-            
-            if end != -1:
-                raw_json = txt[start:end]
-                clean_json = raw_json.replace('\\"', '"')
-                
-                try:
-                    import json
-                    data = json.loads(clean_json)
-                    
-                    # --- PARSING ---
-                    if not main_char and data.get("mainChar"):
-                        main_char = list(data["mainChar"].keys())[0]
-
-                    if main_char and "playedCharacters" in data:
-                        char_data = data["playedCharacters"].get(main_char, {})
-                        ranked_data = char_data.get("RANKED_BATTLE", {})
-                        if "allTimeMatchups" in ranked_data:
-                            matchups = ranked_data["allTimeMatchups"]
-
-                    # On essaie de récupérer le pentagone
-                    if "statPentagonData" in data:
-                        pentagon = data["statPentagonData"]
-
-                    # Extraction des Games
-                    # (On extrait toujours les games au cas où ce bloc soit le bon)
-                    temp_games = [] 
-                    viewer_pid = data.get("playerMetadata", {}).get("polarisId")
-                    battles = data.get("battles", [])
-                    
-                    for b in battles:
-                        if b.get("battleType") != "RANKED_BATTLE": continue
-                        
-                        if b.get("p1PolarisId") == viewer_pid:
-                            ws, my, op = 1, "p1", "p2"
-                        elif b.get("p2PolarisId") == viewer_pid:
-                            ws, my, op = 2, "p2", "p1"
-                        else: continue
-
-                        my_c = b.get(f"{my}Char")
-                        op_c = b.get(f"{op}Char")
-                        opp_n = b.get(f"{op}Name")
-                        opp_r = b.get(f"{op}DanRank")
-                        r_won = b.get(f"{my}RoundsWon")
-                        r_lost = b.get(f"{op}RoundsWon")
-                        score = f"{r_won}-{r_lost}"
-                        result = "WIN" if b.get("winner") == ws else "LOSS"
-
-                        ts_str = b.get("battleAt")
-                        ts_unix = 0
-                        if ts_str:
-                            dt = datetime.fromisoformat(ts_str.replace("Z", "+00:00"))
-                            ts_unix = int(dt.timestamp())
-
-                        temp_games.append({
-                            "timestamp_unix": ts_unix,
-                            "timestamp_iso": ts_str,
-                            "result": result,
-                            "score": score,
-                            "opponent": opp_n,
-                            "opponent_char": op_c,
-                            "opponent_rank": opp_r, 
-                            "my_char": my_c,
-                            "source": "ewgf"
-                        })
-                    
-                    # Si on a trouvé des games dans ce bloc, on les garde
-                    if temp_games:
-                        games = temp_games
-
-                    # --- CONDITION D'ARRÊT MODIFIÉE ---
-                    # On ne s'arrête QUE si on a trouvé le pentagone.
-                    # Sinon, on continue de chercher dans les autres scripts !
-                    if pentagon:
-                        break
-
-                except Exception as e:
-                    print(f"JSON Parse Error: {e}")
-                    continue
+    # 2. Blocs JSON playerStats
+    for data in extract_ewgf_player_stats(html):
+        try:
+            if not main_char and data.get("mainChar"):
+                main_char = list(data["mainChar"].keys())[0]
+
+            if main_char and "playedCharacters" in data:
+                char_data = data["playedCharacters"].get(main_char, {})
+                ranked_data = char_data.get("RANKED_BATTLE", {})
+                if "allTimeMatchups" in ranked_data:
+                    matchups = ranked_data["allTimeMatchups"]
+
+            if "statPentagonData" in data:
+                pentagon = data["statPentagonData"]
+
+            # Si on a trouvé des games dans ce bloc, on les garde
+            temp_games = _ewgf_games(data, since_ts)
+            if temp_games:
+                games = temp_games
+        except Exception as e:
+            print(f"JSON Parse Error: {e}")
+            continue
 
     return rank, games, main_char, matchups, pentagon
+
+# ---------------------
+# PARSE CACHE
+# ---------------------
+def html_digest(html: str) -> bytes:
+    return hashlib.blake2b(html.encode("utf-8", "surrogatepass"), digest_size=16).digest()
+
+class ParseCache:
+    """LRU borné des résultats de parsing, indexé par (source, joueur, hash du HTML)."""
+
+    def __init__(self, maxsize: int = 256):
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[tuple, object]" = OrderedDict()
+        self._lock = threading.Lock()  # Les parsers tournent dans des threads
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def hit_ratio(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def key(self, source: str, owner: str, html: str, **kwargs) -> tuple:
+        return (source, owner, html_digest(html), tuple(sorted(kwargs.items())))
+
+    def get(self, key: tuple):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+        return None
+
+    def put(self, key: tuple, result):
+        with self._lock:
+            self._entries[key] = result
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def parse(self, source: str, owner: str, parser, html: str, **kwargs):
+        key = self.key(source, owner, html, **kwargs)
+        result = self.get(key)
+        if result is None:
+            result = parser(html, **kwargs)
+            self.put(key, result)
+        return result
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+PARSE_CACHE = ParseCache()
+
+# ---------------------
+# PARSE WORKERS
+# ---------------------
+# "thread" : asyncio.to_thread (défaut). "process" : ProcessPoolExecutor, le parsing ne prend plus
+# le GIL du process Discord (heartbeat, slash commands).
+PARSE_MODE = "thread"
+PARSE_WORKERS = 2
+
+_parse_pool: Optional[ProcessPoolExecutor] = None
+
+def _warm_worker():
+    # Imports faits une fois au démarrage du worker, pas au premier parsing
+    import bs4, html5lib  # noqa: F401
+
+def _ping_worker():
+    return os.getpid()
+
+def _parse_in_worker(source: str, html: str, since_ts: Optional[int]):
+    """Exécuté dans un worker : renvoie des lignes (Game.to_row) plutôt que des objets (pickle plus léger)."""
+    if source == "wavu":
+        rating, games = parse_wavu_html(html, since_ts=since_ts)
+        return rating, [g.to_row() for g in games]
+    rank, games, main_char, matchups, pentagon = parse_ewgf_html(html, since_ts=since_ts)
+    return (rank, [g.to_row() for g in games], main_char, matchups, pentagon, dict(EWGF_EXTRACT_STATS))
+
+def _expand_payload(source: str, payload):
+    if source == "wavu":
+        rating, rows = payload
+        return rating, [Game.from_row(r) for r in rows]
+    rank, rows, main_char, matchups, pentagon, extract_stats = payload
+    EWGF_EXTRACT_STATS["calls"] += 1
+    EWGF_EXTRACT_STATS["total_ms"] += extract_stats["last_ms"]
+    for k in ("last_ms", "last_payload_bytes", "last_blocks"): EWGF_EXTRACT_STATS[k] = extract_stats[k]
+    return rank, [Game.from_row(r) for r in rows], main_char, matchups, pentagon
+
+def set_parse_mode(mode: str, workers: int = PARSE_WORKERS):
+    global PARSE_MODE, PARSE_WORKERS
+    PARSE_MODE = mode if mode in ("thread", "process") else "thread"
+    PARSE_WORKERS = max(1, workers)
+    if PARSE_MODE == "process": _get_parse_pool()
+
+def _get_parse_pool() -> Optional[ProcessPoolExecutor]:
+    global _parse_pool, PARSE_MODE
+    if _parse_pool is None:
+        try:
+            _parse_pool = ProcessPoolExecutor(max_workers=PARSE_WORKERS, initializer=_warm_worker)
+            # Démarre tous les workers tout de suite (imports faits avant le premier parsing)
+            for _ in range(PARSE_WORKERS): _parse_pool.submit(_ping_worker)
+        except Exception as e:
+            print(f"Process pool indisponible, parsing en threads : {e}")
+            PARSE_MODE = "thread"
+            _parse_pool = None
+    return _parse_pool
+
+def shutdown_parse_pool():
+    global _parse_pool
+    if _parse_pool is not None:
+        _parse_pool.shutdown(wait=False, cancel_futures=True)
+        _parse_pool = None
+
+async def _run_parser(source: str, html: str, since_ts: Optional[int]):
+    with PARSE_SECONDS.time(source=source):
+        return await _run_parser_untimed(source, html, since_ts)
+
+async def _run_parser_untimed(source: str, html: str, since_ts: Optional[int]):
+    global _parse_pool
+    parser = parse_wavu_html if source == "wavu" else parse_ewgf_html
+    if PARSE_MODE == "process":
+        pool = _get_parse_pool()
+        if pool is not None:
+            try:
+                payload = await asyncio.get_running_loop().run_in_executor(pool, _parse_in_worker, source, html, since_ts)
+                return _expand_payload(source, payload)
+            except BrokenProcessPool as e:
+                # Worker mort (OOM, kill...) : on recrée le pool au prochain appel, ce parsing passe en thread.
+                # Le pool cassé est arrêté (thread de gestion, workers restants), s'il n'a pas déjà été remplacé
+                print(f"Process pool cassé, fallback thread : {e}")
+                pool.shutdown(wait=False, cancel_futures=True)
+                if _parse_pool is pool: _parse_pool = None
+    return await asyncio.to_thread(parser, html, since_ts=since_ts)
+
+async def _parse_with_cache(source: str, owner: str, html: str, since_ts: Optional[int], parse_cache: Optional[ParseCache]):
+    if parse_cache is None:
+        return await _run_parser(source, html, since_ts)
+    key = parse_cache.key(source, owner, html, since_ts=since_ts)
+    result = parse_cache.get(key)
+    if result is None:
+        result = await _run_parser(source, html, since_ts)
+        parse_cache.put(key, result)
+    return result
+
 # ---------------------
 # FETCH BOTH
 # ---------------------
-async def fetch_html(session, url):
+class HostLimiter:
+    """Limite le nombre de requêtes simultanées par site (ex: {"wavu.wiki": 4, "ewgf.gg": 4})."""
+
+    def __init__(self, limits: Dict[str, int]):
+        self.limits = dict(limits or {})
+        self._sems: Dict[str, asyncio.Semaphore] = {}
+
+    def _key_for(self, url: str) -> Optional[str]:
+        host = (urlparse(url).hostname or "").lower()
+        for key in self.limits:
+            if host == key or host.endswith("." + key):
+                return key
+        return None
+
+    @asynccontextmanager
+    async def limit(self, url: str):
+        key = self._key_for(url)
+        if key is None:
+            yield
+            return
+        # Créé à la première utilisation pour être lié à la bonne event loop
+        sem = self._sems.get(key)
+        if sem is None:
+            sem = self._sems[key] = asyncio.Semaphore(self.limits[key])
+        async with sem:
+            yield
+
+class ConditionalCache:
+    """Validateurs HTTP par URL (ETag / Last-Modified, ou hash du contenu) + dernier résultat parsé."""
+
+    def __init__(self):
+        self._entries: Dict[str, Dict] = {}
+        self.hits = 0    # Pages inchangées (304 ou même hash)
+        self.misses = 0  # Pages téléchargées et à reparser
+
+    def request_headers(self, url: str) -> Dict[str, str]:
+        entry = self._entries.get(url)
+        # On n'envoie de requête conditionnelle que si on a de quoi répondre "inchangé"
+        if not entry or entry.get("parsed") is None: return {}
+        headers = {}
+        if entry.get("etag"): headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"): headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def is_unchanged(self, url: str, resp_headers, body: str) -> bool:
+        """Enregistre les validateurs de la réponse 200. Renvoie True si le contenu est identique au précédent."""
+        entry = self._entries.setdefault(url, {})
+        etag = resp_headers.get("ETag")
+        last_modified = resp_headers.get("Last-Modified")
+        digest = None
+        if not etag and not last_modified:
+            # Pas de validateurs côté serveur : on compare un hash du contenu
+            digest = html_digest(body)
+            if digest == entry.get("digest") and entry.get("parsed") is not None:
+                return True
+        entry.update(etag=etag, last_modified=last_modified, digest=digest, parsed=None)
+        return False
+
+    def get_parsed(self, url: str):
+        entry = self._entries.get(url)
+        return entry.get("parsed") if entry else None
+
+    def set_parsed(self, url: str, parsed):
+        if url in self._entries: self._entries[url]["parsed"] = parsed
+
+    def forget(self, url: str):
+        self._entries.pop(url, None)
+
+# Cache partagé par défaut (un seul bot par process)
+HTTP_CACHE = ConditionalCache()
+
+async def fetch_html(http: HttpClient, url, limiter: Optional[HostLimiter] = None, cache: Optional[ConditionalCache] = None,
+                     source: Optional[str] = None):
+    """Renvoie le HTML, NOT_MODIFIED si la page n'a pas changé depuis le dernier fetch, ou None en cas d'erreur."""
+    if limiter is not None:
+        async with limiter.limit(url):
+            return await fetch_html(http, url, cache=cache, source=source)
+
     headers = {"User-Agent": "Mozilla/5.0"}
-    async with session.get(url, headers=headers, timeout=20) as resp:
-        if resp.status != 200: return None
-        return await resp.text()
+    if cache is not None: headers.update(cache.request_headers(url))
+    label = source or "other"
+    try:
+        with FETCH_SECONDS.time(source=label):
+            status, resp_headers, text = await http.get(url, headers=headers, source=source)
+    except CircuitOpenError:
+        FETCH_SKIPPED.inc(source=label)
+        return None
+    except Exception as e:
+        FETCH_ERRORS.inc(source=label)
+        print(f"Fetch error {url}: {type(e).__name__} {e}")
+        return None
 
-async def fetch_both_profiles(session, wavu_url=None, ewgf_url=None):
+    if status == 304 and cache is not None and cache.get_parsed(url) is not None:
+        cache.hits += 1
+        FETCH_NOT_MODIFIED.inc(source=label)
+        return NOT_MODIFIED
+    if status != 200:
+        FETCH_ERRORS.inc(source=label)
+        return None
+    if cache is not None:
+        if cache.is_unchanged(url, resp_headers, text):
+            cache.hits += 1
+            FETCH_NOT_MODIFIED.inc(source=label)
+            return NOT_MODIFIED
+        cache.misses += 1
+    return text
+
+async def fetch_both_profiles(http: HttpClient, wavu_url=None, ewgf_url=None, limiter: Optional[HostLimiter] = None,
+                              cache: Optional[ConditionalCache] = HTTP_CACHE,
+                              parse_cache: Optional[ParseCache] = PARSE_CACHE,
+                              watermarks: Optional[Dict[str, int]] = None, full_parse: bool = False,
+                              merge_tolerance: int = MERGE_TOLERANCE):
+    """watermarks : {"wavu": ts, "ewgf": ts} du joueur. Les parsers s'arrêtent aux matchs déjà vus.
+    Le dict n'est pas modifié : les watermarks avancés au match le plus récent de chaque source sont
+    renvoyés en dernier, à enregistrer seulement une fois les matchs ingérés.
+    full_parse=True ignore les watermarks (backfill, reconstruction du cache).
+    merge_tolerance : écart max (s) entre les timestamps des deux sites pour un même match."""
+    since = {} if (watermarks is None or full_parse) else watermarks
     tasks = []
-    tasks.append(fetch_html(session, wavu_url) if wavu_url else _dummy_coro())
-    tasks.append(fetch_html(session, ewgf_url) if ewgf_url else _dummy_coro())
+    tasks.append(fetch_html(http, wavu_url, limiter, cache, "wavu") if wavu_url else _dummy_coro())
+    tasks.append(fetch_html(http, ewgf_url, limiter, cache, "ewgf") if ewgf_url else _dummy_coro())
     
     results = await asyncio.gather(*tasks, return_exceptions=True)
-    wavu_html = results[0] if isinstance(results[0], str) else None
-    ewgf_html = results[1] if isinstance(results[1], str) else None
+    wavu_html = results[0] if isinstance(results[0], str) or results[0] is NOT_MODIFIED else None
+    ewgf_html = results[1] if isinstance(results[1], str) or results[1] is NOT_MODIFIED else None
 
-    if wavu_html:
-        w_rating, w_games = await asyncio.to_thread(parse_wavu_html, wavu_html)
+    # Page inchangée : on réutilise le résultat parsé précédent, sans reparser
+    if wavu_html is NOT_MODIFIED:
+        w_rating, w_games = cache.get_parsed(wavu_url)
+    elif wavu_html:
+        w_rating, w_games = await _parse_with_cache("wavu", wavu_url, wavu_html, since.get("wavu"), parse_cache)
+        if cache is not None: cache.set_parsed(wavu_url, (w_rating, w_games))
     else:
         w_rating, w_games = (None, [])
 
     # Modification ici pour récupérer matchups et pentagon
-    if ewgf_html:
-        e_rank, e_games, main_char, matchups, pentagon = await asyncio.to_thread(parse_ewgf_html, ewgf_html)
+    if ewgf_html is NOT_MODIFIED:
+        e_rank, e_games, main_char, matchups, pentagon = cache.get_parsed(ewgf_url)
+    elif ewgf_html:
+        e_rank, e_games, main_char, matchups, pentagon = await _parse_with_cache(
+            "ewgf", ewgf_url, ewgf_html, since.get("ewgf"), parse_cache
+        )
+        if cache is not None: cache.set_parsed(ewgf_url, (e_rank, e_games, main_char, matchups, pentagon))
     else:
         e_rank, e_games, main_char, matchups, pentagon = (None, [], None, {}, {})
 
-    merged = {}
-    all_games = e_games + w_games 
-    
-    for g in all_games:
-        opp_clean = re.sub(r'\W+', '', g['opponent']).lower()
-        key = f"{g['timestamp_unix']}_{opp_clean}_{g['score']}"
-        if key not in merged:
-            merged[key] = g
-        else:
-            if not merged[key].get('opponent_rank') and g.get('opponent_rank'):
-                 merged[key]['opponent_rank'] = g['opponent_rank']
+    new_watermarks = dict(watermarks or {})
+    for source, src_games in (("wavu", w_games), ("ewgf", e_games)):
+        if src_games:
+            newest = max(g['timestamp_unix'] for g in src_games)
+            if newest > new_watermarks.get(source, 0): new_watermarks[source] = newest
 
-    final_games = sorted(merged.values(), key=lambda x: x['timestamp_unix'], reverse=True)
+    with MERGE_SECONDS.time():
+        final_games = merge_games(e_games, w_games, merge_tolerance)
     # On retourne tout
-    return e_rank, w_rating, final_games, main_char, matchups, pentagon
\ No newline at end of file
+    return e_rank, w_rating, final_games, main_char, matchups, pentagon, new_watermarks
+
+_ts = attrgetter("timestamp_unix")
+# Champs qu'un seul site a : rang adverse (EWGF), persos et date ISO (selon les pages)
+JOIN_FILL_FIELDS = ("opponent_rank", "opponent_char", "my_char", "timestamp_iso")
+
+def _join_key(g):
+    # uid sans le timestamp : "<adversaire normalisé>_<score>" (l'uid sert ensuite à la dédup)
+    return g.uid.partition("_")[2]
+
+def join_games(e_games: List[Game], w_games: List[Game], tolerance: int = MERGE_TOLERANCE):
+    """Jointure tri-fusion en une passe : un match Wavu est le même qu'un match EWGF si adversaire et
+    score sont identiques et que les timestamps sont à moins de `tolerance` secondes.
+    Renvoie (matchs EWGF triés, matchs Wavu sans équivalent, nb joints, nb joints avec décalage).
+    Les matchs complétés par Wavu sont des copies : ceux reçus restent ceux des caches (parse, HTTP)."""
+    # Pages déjà triées : Timsort ne fait qu'une passe
+    e_sorted = sorted(e_games, key=_ts, reverse=True)
+    w_sorted = sorted(w_games, key=_ts, reverse=True)
+    w_ts = [w.timestamp_unix for w in w_sorted]
+    w_keys = [None] * len(w_sorted)
+    matched = [False] * len(w_sorted)
+    n = len(w_sorted)
+    joined = skewed = 0
+    start = 0
+    for i, e in enumerate(e_sorted):
+        ts = e.timestamp_unix
+        # Les matchs Wavu plus récents que ts + tolerance ne peuvent plus être joints (listes décroissantes)
+        while start < n and w_ts[start] > ts + tolerance: start += 1
+        key = None
+        best = None
+        j = start
+        while j < n and w_ts[j] >= ts - tolerance:
+            if not matched[j]:
+                if key is None: key = _join_key(e)
+                if w_keys[j] is None: w_keys[j] = _join_key(w_sorted[j])
+                if w_keys[j] == key and (best is None or abs(w_ts[j] - ts) < abs(w_ts[best] - ts)): best = j
+            j += 1
+        if best is None: continue
+        matched[best] = True
+        joined += 1
+        if w_ts[best] != ts: skewed += 1
+        w = w_sorted[best]
+        missing = [f for f in JOIN_FILL_FIELDS if getattr(e, f) is None and getattr(w, f) is not None]
+        if missing:
+            e = e_sorted[i] = e.copy()
+            for f in missing: setattr(e, f, getattr(w, f))
+
+    return e_sorted, [w for w, m in zip(w_sorted, matched) if not m], joined, skewed
+
+def merge_games(e_games: List[Game], w_games: List[Game], tolerance: int = MERGE_TOLERANCE) -> List[Game]:
+    """Fusionne les matchs EWGF et Wavu (EWGF prioritaire), du plus récent au plus ancien."""
+    e_sorted, wavu_only, joined, skewed = join_games(e_games, w_games, tolerance)
+    MERGE_GAMES.inc(joined, outcome="joined")
+    MERGE_GAMES.inc(skewed, outcome="skewed")
+    MERGE_GAMES.inc(len(e_sorted) - joined, outcome="ewgf_only")
+    MERGE_GAMES.inc(len(wavu_only), outcome="wavu_only")
+    # Deux suites déjà triées : Timsort les fusionne en une passe
+    return sorted(e_sorted + wavu_only, key=_ts, reverse=True)
@@ -3,7 +3,7 @@ import discord
 from discord.ext import commands
 from discord import app_commands
 import asyncio
-from datetime import datetime, timezone
+from datetime import datetime, timezone, timedelta
 import pytz
 import os
 import random
@@ -23,30 +23,46 @@ from config import (
     MESSAGES_RANK_UP, MESSAGES_DERANK, MESSAGES_KING
 )
 from player_manager import PlayerManager
+from scheduler import PollScheduler
+from metrics import REGISTRY, timed, start_metrics_server
+from event_dispatcher import EventDispatcher, DISCORD_SEND_SECONDS, DISCORD_SEND_ERRORS
+import config
 from chart_generator import create_weekly_graph
+import analytics
 
 TZ_PARIS = pytz.timezone("Europe/Paris")
+BOOT_TIME = time.perf_counter()
+# Endpoint Prometheus local (None pour le désactiver)
+METRICS_HOST = getattr(config, "METRICS_HOST", "127.0.0.1")
+METRICS_PORT = getattr(config, "METRICS_PORT", 9108)
+# Envoi des events : workers, et token bucket par channel (EVENT_CHANNEL_BURST messages d'affilée puis
+# EVENT_CHANNEL_RATE messages / s). Sur n'importe quelles 5 s, au plus BURST + 5 * RATE envois :
+# à garder <= 5 pour rester sous la limite Discord de 5 messages / 5 s par channel
+EVENT_WORKERS = getattr(config, "EVENT_WORKERS", 2)
+EVENT_CHANNEL_RATE = getattr(config, "EVENT_CHANNEL_RATE", 0.4)
+EVENT_CHANNEL_BURST = getattr(config, "EVENT_CHANNEL_BURST", 3)
 intents = discord.Intents.default()
 intents.message_content = True
 
 WIDE_SPACER_IMAGE = "images/spacer.png"
 TEKKEN8_LOGO = "images/Tekken-8-Logo.png"
+# Tranches du prime time (ordre d'affichage) -> index dans Player.aggregates.slots
+# Forme dans /tekken_stats : winrate glissant sur les N derniers matchs
+FORM_GAMES = getattr(config, "FORM_GAMES", 20)
+SLOT_NAMES = (("🌅 Matin (06-12h)", 1), ("😎 Midi (12-18h)", 2), ("🔥 Soir (18-00h)", 3), ("🦉 Nuit (00-06h)", 0))
 
 # -----------------------
 # SLASH COMMANDS
 # -----------------------
 
-"""
 @app_commands.command(name="force_daily", description="ADMIN: Générer un Daily Report (Aujourd'hui ou Passé)")
+@app_commands.default_permissions(administrator=True)
 @app_commands.choices(jour=[
     app_commands.Choice(name="Aujourd'hui", value=0),
     app_commands.Choice(name="Hier", value=1),
     app_commands.Choice(name="Avant-hier", value=2)
 ])
 async def force_daily(interaction: discord.Interaction, jour: int = 0):
-    # Vérification (Optionnel : limiter aux admins)
-    # if interaction.user.id != TON_ID: return ...
-
     bot = interaction.client
     channel = bot.get_channel(REPORT_CHANNEL_ID)
     if not channel: 
@@ -58,7 +74,7 @@ async def force_daily(interaction: discord.Interaction, jour: int = 0):
     target_date = datetime.now(TZ_PARIS) - timedelta(days=jour)
     date_title = target_date.strftime("%d/%m/%Y")
     
-    # Génération
+    # Génération (buckets jour / heure des joueurs, pas besoin de l'historique)
     data = bot.pm.generate_daily_report(target_date)
     
     # Envoi
@@ -69,7 +85,7 @@ async def force_daily(interaction: discord.Interaction, jour: int = 0):
         await bot.send_daily_report(channel, data)
     else:
         await channel.send(f"💤 **Rapport du {date_title}** : Aucun match trouvé cette journée-là.")
-"""
+
 @app_commands.command(name="tekken_stats", description="Affiche la carte d'identité complète (Stats All-Time, Matchups, Bulletin Technique)")
 @app_commands.choices(player=[app_commands.Choice(name=n, value=n) for n in PLAYERS])
 async def full_stats(interaction: discord.Interaction, player: str):
@@ -79,23 +95,12 @@ async def full_stats(interaction: discord.Interaction, player: str):
     if not p: 
         return await interaction.response.send_message("Joueur inconnu.", ephemeral=True)
     
-    wins = sum(1 for g in p.games if g['result'] == 'WIN')
-    total = len(p.games)
-    losses = total - wins
-    wr = round(wins/total*100, 1) if total > 0 else 0.0
+    # Compteurs all-time tenus à jour à l'ingestion (Player.aggregates) : rien à parcourir ici
+    agg = p.aggregates
+    wins, total, losses, wr = agg.wins, agg.total, agg.losses, agg.winrate
     
     # CLUTCH
-    clutch_wins = 0
-    clutch_total = 0
-    for g in p.games:
-        if 'score' in g:
-            try:
-                parts = g['score'].split('-')
-                if len(parts) == 2 and (int(parts[0]) + int(parts[1]) == 5):
-                    clutch_total += 1
-                    if g['result'] == 'WIN': clutch_wins += 1
-            except: continue
-
+    clutch_wins, clutch_total = agg.clutch_wins, agg.clutch_total
     clutch_wr = round((clutch_wins / clutch_total) * 100, 1) if clutch_total > 0 else 0
     if clutch_total < 5: clutch_title = "Pas assez de données"
     elif clutch_wr >= 60: clutch_title = "❄️ **ICE COLD** (Sang froid)"
@@ -103,17 +108,7 @@ async def full_stats(interaction: discord.Interaction, player: str):
     else: clutch_title = "🥀 **Mental de chips** (Choke)"
 
     # PRIME TIME
-    slots = {k: {'wins': 0, 'total': 0} for k in ["🌅 Matin (06-12h)", "😎 Midi (12-18h)", "🔥 Soir (18-00h)", "🦉 Nuit (00-06h)"]}
-    for g in p.games:
-        dt = datetime.fromtimestamp(g['timestamp_unix'], tz=TZ_PARIS)
-        h = dt.hour
-        key = "🦉 Nuit (00-06h)"
-        if 6 <= h < 12: key = "🌅 Matin (06-12h)"
-        elif 12 <= h < 18: key = "😎 Midi (12-18h)"
-        elif 18 <= h < 24: key = "🔥 Soir (18-00h)"
-        
-        slots[key]['total'] += 1
-        if g['result'] == 'WIN': slots[key]['wins'] += 1
+    slots = {name: {'wins': agg.slots[i][0], 'total': agg.slots[i][1]} for name, i in SLOT_NAMES}
 
     best_slot_name = "Indéterminé"
     best_slot_wr = -1
@@ -136,6 +131,27 @@ async def full_stats(interaction: discord.Interaction, player: str):
     
     embed.add_field(name="🧠 Mental & Clutch Factor", value=f"**Indice Clutch :** `{clutch_wr}%` sur {clutch_total} matchs décisifs.\nVerdict : {clutch_title}\n\n**⚡ Prime Time :** {best_slot_name} \n{prime_time_txt}", inline=False)
 
+    # FORME (historique en colonnes, analytics.py)
+    cols = analytics.columns(p)
+    form = analytics.rolling_form(cols, FORM_GAMES)
+    if len(form):
+        trend = "📈" if form[-1] > wr + 5 else "📉" if form[-1] < wr - 5 else "➡️"
+        embed.add_field(name="🔥 Forme", value=f"**{FORM_GAMES} derniers matchs :** `{form[-1]:.0f}%` {trend} (all-time `{wr}%`)\n"
+                        f"**Pic / creux :** `{form.max():.0f}%` / `{form.min():.0f}%`\n"
+                        f"**Upsets :** {analytics.upset_wins(cols, p.ewgf_rank)} victoires contre un rang supérieur ({len(cols)} derniers matchs)", inline=False)
+
+    # 7 DERNIERS JOURS (glissants, mêmes colonnes : la fenêtre est trouvée par dichotomie)
+    week = cols.window(time.time() - 7 * 86400)
+    if len(week):
+        w_wins, w_total, w_wr = analytics.winrate(week)
+        w_cw, w_ct = analytics.clutch(week)
+        w_slots = analytics.prime_time(week)
+        best_week = max(((name, round(w_slots[i][0] / w_slots[i][1] * 100)) for name, i in SLOT_NAMES if w_slots[i][1] >= 3),
+                        key=lambda x: x[1], default=None)
+        embed.add_field(name="📅 7 derniers jours", value=f"**Winrate :** `{w_wr}%` ({w_wins}W - {w_total - w_wins}L)\n"
+                        f"**Clutch :** {w_cw}/{w_ct} • **Défaites serrées :** {analytics.close_losses(week)}\n"
+                        f"**Meilleur créneau :** {f'{best_week[0]} `{best_week[1]}%`' if best_week else 'Indéterminé'}", inline=False)
+
     # BULLETIN (VERBEUX)
     if p.pentagon_stats:
         s = p.pentagon_stats
@@ -156,6 +172,12 @@ async def full_stats(interaction: discord.Interaction, player: str):
         embed.add_field(name="🔸 Profil Technique", value=tech_txt, inline=False)
 
     # --- AJOUT ICI : LES PLUS AFFRONTÉS ---
+    if not p.matchups and len(cols):
+        # Pas de matchups EWGF : on les reprend de l'historique
+        most_played = sorted(analytics.matchups(cols).items(), key=lambda x: x[1][1], reverse=True)[:3]
+        encounter_txt = "".join(f"**{char_name}** : {t} games ({round(w / t * 100)}% WR)\n" for char_name, (w, t) in most_played)
+        if encounter_txt:
+            embed.add_field(name="👊 Persos les plus affrontés (historique)", value=encounter_txt, inline=False)
     if p.matchups:
         # On trie par 'totalMatches' décroissant
         most_played = sorted(p.matchups.items(), key=lambda x: x[1]['totalMatches'], reverse=True)[:3]
@@ -201,9 +223,7 @@ async def status(interaction: discord.Interaction, player: str):
     embed = discord.Embed(title=f"🥊 {p.name}", color=0x5865F2, timestamp=datetime.now(timezone.utc))
     embed.description = f"**Main Character :** {p.main_char or 'Inconnu'}\n━━━━━━━━━━━━━━━━━━"
     
-    wins = sum(1 for g in p.games if g['result'] == 'WIN')
-    total = len(p.games)
-    wr = round(wins/total*100, 1) if total > 0 else 0.0
+    total, wr = p.aggregates.total, p.aggregates.winrate
 
     embed.add_field(name="🏆 Rank Actuel", value=f"**{p.ewgf_rank or 'Unranked'}**", inline=True)
     embed.add_field(name="📈 Rating", value=f"**{p.rating_mu or 'N/A'}**", inline=True)
@@ -220,6 +240,60 @@ async def status(interaction: discord.Interaction, player: str):
     
     await interaction.response.send_message(embed=embed)
 
+@app_commands.command(name="tekken_metrics", description="ADMIN: Où passe le temps du bot (refresh, parsing, caches, Discord)")
+@app_commands.default_permissions(administrator=True)
+async def tekken_metrics(interaction: discord.Interaction):
+    REGISTRY.collect()
+    m = REGISTRY.metrics
+
+    def fmt(hist_name, **labels):
+        hist = m.get(hist_name)
+        sm = hist.summary(**labels) if hist else None
+        if not sm: return "N/A"
+        return f"moy `{sm['avg'] * 1000:.0f}ms` • p90 ≤ `{sm['p90'] * 1000:.0f}ms` • dernier `{sm['last'] * 1000:.0f}ms` ({sm['count']})"
+
+    def count(name, **labels):
+        metric = m.get(name)
+        if not metric: return 0
+        return int(metric.get(**labels) if labels else metric.total())
+
+    embed = discord.Embed(title="📈 Metrics", color=0x95A5A6, timestamp=datetime.now(timezone.utc))
+    embed.add_field(name="🔄 Refresh", value=f"**Cycle :** {fmt('tekken_refresh_cycle_seconds')}\n**Par joueur :** {fmt('tekken_player_refresh_seconds')}\n"
+                    f"**Nouveaux matchs :** {count('tekken_new_games_total')} • **Events :** {count('tekken_events_total')} • **Erreurs :** {count('tekken_refresh_errors_total')}", inline=False)
+    fetch_txt = ""
+    for source in ("wavu", "ewgf"):
+        fetch_txt += (f"**{source} :** {fmt('tekken_fetch_seconds', source=source)}\n"
+                      f"↳ erreurs {count('tekken_fetch_errors_total', source=source)} • inchangées {count('tekken_fetch_not_modified_total', source=source)} • "
+                      f"circuit ouvert {count('tekken_fetch_circuit_open_total', source=source)}\n")
+    embed.add_field(name="🌐 Fetch", value=fetch_txt, inline=False)
+    embed.add_field(name="🧩 Parsing & merge", value=f"**wavu :** {fmt('tekken_parse_seconds', source='wavu')}\n**ewgf :** {fmt('tekken_parse_seconds', source='ewgf')}\n"
+                    f"**merge :** {fmt('tekken_merge_seconds')}\n**add_games :** {fmt('tekken_add_games_seconds')}\n"
+                    f"**Jointure :** {count('tekken_merge_games_total', outcome='joined')} joints (dont {count('tekken_merge_games_total', outcome='skewed')} décalés) • "
+                    f"EWGF seul {count('tekken_merge_games_total', outcome='ewgf_only')} • Wavu seul {count('tekken_merge_games_total', outcome='wavu_only')}", inline=False)
+    ratio = m.get("tekken_cache_hit_ratio")
+    cache_txt = " • ".join(f"{c} `{ratio.get(cache=c) * 100:.0f}%`" for c in ("http", "parse")) if ratio else "N/A"
+    embed.add_field(name="💾 Caches & disque", value=f"**Hit ratio :** {cache_txt}\n**Sérialisation (loop) :** {fmt('tekken_save_snapshot_seconds')}\n"
+                    f"**Écriture disque :** {fmt('tekken_save_cache_seconds')}", inline=False)
+    embed.add_field(name="💬 Discord", value=f"**Events :** {fmt('tekken_discord_send_seconds', kind='event')}\n**File :** {interaction.client.events.depth} en attente • "
+                    f"regroupés {count('tekken_events_coalesced_total')}\n**Délai file → envoi :** {fmt('tekken_event_dispatch_seconds')}\n"
+                    f"**Erreurs d'envoi :** {count('tekken_discord_send_errors_total')}", inline=False)
+    await interaction.response.send_message(embed=embed, ephemeral=True)
+
+@app_commands.command(name="tekken_rebuild_stats", description="ADMIN: Recalculer les compteurs de stats depuis l'historique")
+@app_commands.default_permissions(administrator=True)
+@app_commands.choices(player=[app_commands.Choice(name=n, value=n) for n in PLAYERS])
+async def rebuild_stats(interaction: discord.Interaction, player: str = None):
+    # Relecture de toute la base possible : réponse différée, sinon Discord abandonne l'interaction après 3 s
+    await interaction.response.defer(ephemeral=True)
+    bot = interaction.client
+    targets = [bot.pm.players[player]] if player in bot.pm.players else list(bot.pm.players.values())
+    txt = ""
+    for p in targets:
+        before = p.aggregates.total
+        await bot.pm.rebuild_stats(p.name)
+        txt += f"**{p.name}** : {before} → {p.aggregates.total} games ({p.aggregates.winrate}%)\n"
+    await interaction.followup.send(f"🔧 Compteurs recalculés :\n{txt or 'Aucun joueur.'}", ephemeral=True)
+
 @app_commands.command(name="test_events", description="ADMIN: Tester events + reports")
 async def test_events(interaction: discord.Interaction):
     bot = interaction.client
@@ -275,12 +349,21 @@ class TekkenBot(commands.Bot):
     def __init__(self):
         super().__init__(command_prefix="!", intents=intents)
         self.pm = PlayerManager()
+        self.boot_reported = False
+        self.scheduler = PollScheduler(
+            PLAYERS.keys(), INTERVAL_ACTIVE, INTERVAL_IDLE, INTERVAL_SLEEP, ACTIVITY_THRESHOLD
+        )
+        # Les events partent par une file : le refresh n'attend jamais Discord
+        self.events = EventDispatcher(self.build_event_messages, EVENT_WORKERS, EVENT_CHANNEL_RATE, EVENT_CHANNEL_BURST)
+        self.cycle = 0
 
     async def setup_hook(self):
         self.tree.add_command(status)
         self.tree.add_command(test_events)
         self.tree.add_command(full_stats)
-#        self.tree.add_command(force_daily)
+        self.tree.add_command(tekken_metrics)
+        self.tree.add_command(rebuild_stats)
+        self.tree.add_command(force_daily)
 
         if STATUS_COMMAND_GUILD_IDS:
             for gid in STATUS_COMMAND_GUILD_IDS:
@@ -291,10 +374,30 @@ class TekkenBot(commands.Bot):
             await self.tree.sync(guild=None)
         else:
             await self.tree.sync()
+        self.metrics_runner = None
+        if METRICS_PORT:
+            try:
+                self.metrics_runner = await start_metrics_server(METRICS_HOST, METRICS_PORT)
+                print(f"📈 Metrics sur http://{METRICS_HOST}:{METRICS_PORT}/metrics")
+            except OSError as e:
+                print(f"Metrics server error: {e}")
+        self.events.start()
         self.loop.create_task(self.background_loop())
 
+    async def close(self):
+        if getattr(self, "metrics_runner", None): await self.metrics_runner.cleanup()
+        await self.events.close()
+        await self.pm.close()
+        await super().close()
+
     async def on_ready(self):
         print(f"✅ Connecté: {self.user}")
+        if not self.boot_reported:
+            # on_ready est rappelé à chaque reconnexion : on ne mesure que le premier
+            self.boot_reported = True
+            boot_s = time.perf_counter() - BOOT_TIME
+            REGISTRY.gauge("tekken_boot_seconds", "Temps entre le lancement et la connexion Discord").set(round(boot_s, 3))
+            print(f"⏱️ Démarrage en {boot_s:.2f}s (dont cache {self.pm.startup_s * 1000:.0f} ms)")
 
     async def background_loop(self):
         await self.wait_until_ready()
@@ -304,17 +407,27 @@ class TekkenBot(commands.Bot):
         
         while not self.is_closed():
             try:
-                events = await self.pm.update_all()
-                for p_name, event in events:
-                    target = rank_ch if event[0] in ["rank_up", "derank"] else announce_ch
-                    if target: await self.handle_event(target, p_name, event)
+                # Seuls les joueurs dont l'échéance est passée sont rafraîchis
+                due = self.scheduler.pop_due()
+                if due:
+                    try:
+                        events = await self.pm.update_players(due)
+                        self.cycle += 1
+                        for p_name, event in events:
+                            target = rank_ch if event[0] in ["rank_up", "derank"] else announce_ch
+                            if target: self.events.put(target, p_name, event, self.cycle)
+                    finally:
+                        # Même si le cycle plante : sortis du heap par pop_due, ils doivent y revenir
+                        refreshed_at = time.time()
+                        for name in due:
+                            self.scheduler.reschedule(name, self.pm.last_game_ts(name), refreshed_at)
 
                 now = datetime.now(TZ_PARIS)
                 today = now.strftime("%Y-%m-%d")
 
                 if now.hour == 23 and now.minute >= 55:
                     if any(p.last_daily_report_date != today for p in self.pm.players.values()):
-                        data = self.pm.generate_daily_report(today)
+                        data = self.pm.generate_daily_report(now)
                         if data and report_ch: await self.send_daily_report(report_ch, data)
 
                 if now.weekday() == 6 and now.hour == 23 and now.minute >= 55:
@@ -322,28 +435,15 @@ class TekkenBot(commands.Bot):
                         data = self.pm.generate_weekly_report(today)
                         if data and report_ch: await self.send_weekly_report(report_ch, data)
 
-                is_active_mode = False
-                current_timestamp = datetime.now().timestamp()
-                for p in self.pm.players.values():
-                    if p.games:
-                        if (current_timestamp - p.games[0]['timestamp_unix']) < ACTIVITY_THRESHOLD:
-                            is_active_mode = True
-                            break
-
-                if is_active_mode:
-                    sleep_time = INTERVAL_ACTIVE
-                    print(f"Active mode. Refresh dans {sleep_time}s.")
-                else:
-                    if 3 <= now.hour < 10:
-                        sleep_time = INTERVAL_SLEEP
-                        print(f"Night Mode. Refresh dans {sleep_time}s.")
-
-                    # Si on est à 23h, on force le bot à ne jamais dormir plus de 60 secondes
-                    # pour être sûr de ne pas rater la fenêtre de 23h55.
-                if now.hour == 23 and sleep_time > 200:
-                    sleep_time = 200
-                    print("⏰ Approche du rapport : sommeil forcé à 60s.")
-                # -----------------------------------------------
+                # On dort pile jusqu'à la prochaine échéance (ou jusqu'à 23h55 pour les rapports)
+                sleep_time = self.scheduler.seconds_until_next()
+                if sleep_time is None: sleep_time = INTERVAL_SLEEP
+                report_at = now.replace(hour=23, minute=55, second=0, microsecond=0)
+                if now >= report_at: report_at += timedelta(days=1)
+                sleep_time = min(sleep_time, (report_at - now).total_seconds())
+                if due:
+                    print(f"{self.scheduler.active_count()} joueur(s) actif(s). Prochain refresh dans {sleep_time:.0f}s.")
+                await asyncio.sleep(max(1.0, sleep_time))
 
             except Exception as e:
                 print(f"Loop Error: {e}")
@@ -355,9 +455,8 @@ class TekkenBot(commands.Bot):
         return random.choice(valid) if valid else None
 
     async def handle_event(self, channel, p_name, event):
+        # Envoi direct, sans la file (test_events)
         if not channel: return
-        mention_txt = f"<@{DISCORD_IDS.get(p_name)}>" if p_name in DISCORD_IDS else f"**{p_name}**"
-        ping_content = mention_txt 
         evt = event[0]
         
         if channel.id == TEST_CHANNEL_ID and channel.id != ANNOUNCE_CHANNEL_ID: pass
@@ -366,58 +465,75 @@ class TekkenBot(commands.Bot):
             if rc: channel = rc
 
         try:
-            embed, file_path = None, None
-            def get_msg(msg_list, extra_data=None):
-                if not msg_list: return "Pas de message configuré."
-                txt = random.choice(msg_list)
-                txt = txt.replace("{mention}", mention_txt)
-                if extra_data: txt = txt.replace("{rank}", str(extra_data))
-                return txt
-
-            if evt == "king_picked":
-                embed = discord.Embed(title="🐆 KING DETECTED 🐆", description=get_msg(MESSAGES_KING), color=discord.Color.orange())
-                file_path = self.get_random_video(VIDEOS_KING_PICK)
-            elif evt == "lose_streak_3":
-                embed = discord.Embed(title="💀 Harr 💀", description=get_msg(MESSAGES_LOSE_3), color=0x8B0000)
-                file_path = self.get_random_video(VIDEOS_LOSE_3)
-            elif evt == "lose_streak_5":
-                embed = discord.Embed(title="⚰️ Mega Merde ⚰️", description=get_msg(MESSAGES_LOSE_5), color=0x000000)
-                file_path = self.get_random_video(VIDEOS_LOSE_5)
-            elif evt == "lose_streak_8":
-                embed = discord.Embed(title="🏴‍☠️ DESASTRE 🏴‍☠️", description=get_msg(MESSAGES_LOSE_8), color=0x000000)
-                file_path = self.get_random_video(VIDEOS_LOSE_8)
-            elif evt == "lose_streak_10":
-                embed = discord.Embed(title="🏳️ ABANDONNE 🏳️", description=get_msg(MESSAGES_LOSE_10), color=0x000000)
-                file_path = self.get_random_video(VIDEOS_LOSE_10)
-            elif evt == "win_streak_3":
-                embed = discord.Embed(title="🔥 Win Streak 🔥", description=get_msg(MESSAGES_WIN_3), color=discord.Color.gold())
-                file_path = self.get_random_video(VIDEOS_WIN_3)
-            elif evt == "win_streak_5":
-                embed = discord.Embed(title="🚀 MEGA TEUB 🚀 ", description=get_msg(MESSAGES_WIN_5), color=discord.Color.teal())
-                file_path = self.get_random_video(VIDEOS_WIN_5)
-            elif evt == "win_streak_8":
-                embed = discord.Embed(title="🌟 GOAT 🌟", description=get_msg(MESSAGES_WIN_8), color=discord.Color.purple())
-                file_path = self.get_random_video(VIDEOS_WIN_8)
-            elif evt == "win_streak_10":
-                embed = discord.Embed(title="👑 IMMORTAL 👑", description=get_msg(MESSAGES_WIN_10), color=discord.Color.magenta())
-                file_path = self.get_random_video(VIDEOS_WIN_10)
-            elif evt == "rank_up":
-                embed = discord.Embed(title="🎉 RANK UP 🎉 ", description=get_msg(MESSAGES_RANK_UP, event[2]), color=discord.Color.green())
-                embed.set_thumbnail(url=f"https://www.ewgf.gg/static/rank-icons/{event[2].replace(' ', '')}T8.webp")
-                file_path = self.get_random_video(VIDEOS_RANK_UP)
-            elif evt == "derank":
-                embed = discord.Embed(title="📉 DERANK 📉 ", description=get_msg(MESSAGES_DERANK, event[2]), color=discord.Color.red())
-                file_path = self.get_random_video(VIDEOS_DERANK)
-
-            if embed:
-                await channel.send(content=ping_content, embed=embed)
-                if file_path:
-                    await asyncio.sleep(0.5)
-                    await channel.send(file=discord.File(file_path))
+            for kind, kwargs in self.build_event_messages(p_name, [event]):
+                with DISCORD_SEND_SECONDS.time(kind=kind):
+                    await channel.send(**kwargs)
         except Exception as e:
+            DISCORD_SEND_ERRORS.inc(kind="event")
             print(f"Error sending event: {e}")
 
+    def build_event_messages(self, p_name, events):
+        # Events d'un joueur sur un cycle -> un message (mention + un embed par event, 10 max par message),
+        # puis la vidéo du dernier event qui en a une (le palier de streak le plus haut)
+        mention_txt = f"<@{DISCORD_IDS.get(p_name)}>" if p_name in DISCORD_IDS else f"**{p_name}**"
+        embeds, video = [], None
+        for event in events:
+            embed, file_path = self.build_event_embed(mention_txt, event)
+            if embed: embeds.append(embed)
+            if file_path: video = file_path
+        if not embeds: return []
+        messages = [("event", {"content": mention_txt, "embeds": embeds[i:i + 10]}) for i in range(0, len(embeds), 10)]
+        if video: messages.append(("video", {"file": discord.File(video)}))
+        return messages
+
+    def build_event_embed(self, mention_txt, event):
+        evt = event[0]
+        embed, file_path = None, None
+        def get_msg(msg_list, extra_data=None):
+            if not msg_list: return "Pas de message configuré."
+            txt = random.choice(msg_list)
+            txt = txt.replace("{mention}", mention_txt)
+            if extra_data: txt = txt.replace("{rank}", str(extra_data))
+            return txt
+
+        if evt == "king_picked":
+            embed = discord.Embed(title="🐆 KING DETECTED 🐆", description=get_msg(MESSAGES_KING), color=discord.Color.orange())
+            file_path = self.get_random_video(VIDEOS_KING_PICK)
+        elif evt == "lose_streak_3":
+            embed = discord.Embed(title="💀 Harr 💀", description=get_msg(MESSAGES_LOSE_3), color=0x8B0000)
+            file_path = self.get_random_video(VIDEOS_LOSE_3)
+        elif evt == "lose_streak_5":
+            embed = discord.Embed(title="⚰️ Mega Merde ⚰️", description=get_msg(MESSAGES_LOSE_5), color=0x000000)
+            file_path = self.get_random_video(VIDEOS_LOSE_5)
+        elif evt == "lose_streak_8":
+            embed = discord.Embed(title="🏴‍☠️ DESASTRE 🏴‍☠️", description=get_msg(MESSAGES_LOSE_8), color=0x000000)
+            file_path = self.get_random_video(VIDEOS_LOSE_8)
+        elif evt == "lose_streak_10":
+            embed = discord.Embed(title="🏳️ ABANDONNE 🏳️", description=get_msg(MESSAGES_LOSE_10), color=0x000000)
+            file_path = self.get_random_video(VIDEOS_LOSE_10)
+        elif evt == "win_streak_3":
+            embed = discord.Embed(title="🔥 Win Streak 🔥", description=get_msg(MESSAGES_WIN_3), color=discord.Color.gold())
+            file_path = self.get_random_video(VIDEOS_WIN_3)
+        elif evt == "win_streak_5":
+            embed = discord.Embed(title="🚀 MEGA TEUB 🚀 ", description=get_msg(MESSAGES_WIN_5), color=discord.Color.teal())
+            file_path = self.get_random_video(VIDEOS_WIN_5)
+        elif evt == "win_streak_8":
+            embed = discord.Embed(title="🌟 GOAT 🌟", description=get_msg(MESSAGES_WIN_8), color=discord.Color.purple())
+            file_path = self.get_random_video(VIDEOS_WIN_8)
+        elif evt == "win_streak_10":
+            embed = discord.Embed(title="👑 IMMORTAL 👑", description=get_msg(MESSAGES_WIN_10), color=discord.Color.magenta())
+            file_path = self.get_random_video(VIDEOS_WIN_10)
+        elif evt == "rank_up":
+            embed = discord.Embed(title="🎉 RANK UP 🎉 ", description=get_msg(MESSAGES_RANK_UP, event[2]), color=discord.Color.green())
+            embed.set_thumbnail(url=f"https://www.ewgf.gg/static/rank-icons/{event[2].replace(' ', '')}T8.webp")
+            file_path = self.get_random_video(VIDEOS_RANK_UP)
+        elif evt == "derank":
+            embed = discord.Embed(title="📉 DERANK 📉 ", description=get_msg(MESSAGES_DERANK, event[2]), color=discord.Color.red())
+            file_path = self.get_random_video(VIDEOS_DERANK)
+        return embed, file_path
+
     # --- REPORTS ---
+    @timed("tekken_discord_send_seconds", kind="daily_report")
     async def send_daily_report(self, channel, data):
         embed = discord.Embed(title="📅 Daily Report", color=discord.Color.blue())
         files = []
@@ -459,6 +575,7 @@ class TekkenBot(commands.Bot):
 
     # --- WEEKLY REPORT (CLEAN) ---
 # --- WEEKLY REPORT (VISUEL AÉRÉ) ---
+    @timed("tekken_discord_send_seconds", kind="weekly_report")
     async def send_weekly_report(self, channel, data):
         embed = discord.Embed(title="📆 Weekly Report\n", color=discord.Color.gold())
         files = []
@@ -0,0 +1,119 @@
+# event_dispatcher.py
+# File d'envoi des events : le refresh y pousse ses events et repart aussitôt, un petit pool de workers
+# les envoie sur Discord. Token bucket par channel (Discord limite à ~5 messages / 5 s par channel :
+# burst + 5 * rate <= 5), et les events d'un même joueur sur un même cycle partent en un seul message.
+import asyncio
+import time
+from collections import namedtuple
+from metrics import REGISTRY
+
+QUEUE_DEPTH = REGISTRY.gauge("tekken_event_queue_depth", "Messages d'events en attente d'envoi")
+DISPATCH_SECONDS = REGISTRY.histogram("tekken_event_dispatch_seconds", "Délai entre la mise en file d'un event et son envoi",
+                                      buckets=(0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120))
+EVENTS_COALESCED = REGISTRY.counter("tekken_events_coalesced_total", "Events regroupés dans un message déjà en file")
+DISCORD_SEND_SECONDS = REGISTRY.histogram("tekken_discord_send_seconds", "Durée des envois Discord")
+DISCORD_SEND_ERRORS = REGISTRY.counter("tekken_discord_send_errors_total", "Envois Discord en échec")
+
+class TokenBucket:
+    """`burst` envois d'affilée, puis un envoi toutes les 1/rate secondes."""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    async def acquire(self):
+        while True:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    def hold(self, seconds: float):
+        # Rate limit renvoyé par Discord malgré tout : bucket vidé pour `seconds`
+        self.tokens = min(self.tokens, 0) - seconds * self.rate
+
+# Message d'events en file : un par (channel, joueur, cycle)
+Job = namedtuple("Job", "key channel player events queued")
+
+class EventDispatcher:
+    """build(player, events) -> [(kind, kwargs de channel.send), ...], appelée au moment de l'envoi."""
+
+    def __init__(self, build, workers: int = 2, rate: float = 0.4, burst: int = 3):
+        self.build = build
+        self.workers = workers
+        self.rate = rate
+        self.burst = burst
+        self._queue = None
+        self._tasks = []
+        # Jobs encore en file, pour y ajouter les events suivants du même joueur / cycle
+        self._pending = {}
+        self._buckets = {}
+        self._locks = {}
+
+    def start(self):
+        # Dans l'event loop du bot (setup_hook)
+        self._queue = asyncio.Queue()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    @property
+    def depth(self) -> int:
+        return self._queue.qsize() if self._queue else 0
+
+    def put(self, channel, player, event, cycle=None):
+        key = (channel.id, player, cycle)
+        job = self._pending.get(key)
+        if job is not None:
+            job.events.append(event)
+            EVENTS_COALESCED.inc()
+            return
+        job = self._pending[key] = Job(key, channel, player, [event], time.perf_counter())
+        self._queue.put_nowait(job)
+        QUEUE_DEPTH.set(self._queue.qsize())
+
+    async def _worker(self):
+        while True:
+            job = await self._queue.get()
+            # Sorti de la file : les events suivants partiront dans un nouveau message
+            self._pending.pop(job.key, None)
+            QUEUE_DEPTH.set(self._queue.qsize())
+            try:
+                await self._send(job)
+            except Exception as e:
+                DISCORD_SEND_ERRORS.inc(kind="event")
+                print(f"Error sending event: {e}")
+            finally:
+                self._queue.task_done()
+
+    async def _send(self, job):
+        cid = job.channel.id
+        bucket = self._buckets.get(cid)
+        if bucket is None: bucket = self._buckets[cid] = TokenBucket(self.rate, self.burst)
+        # Un channel à la fois : les messages d'un même channel restent dans l'ordre de la file
+        lock = self._locks.get(cid)
+        if lock is None: lock = self._locks[cid] = asyncio.Lock()
+        async with lock:
+            for kind, kwargs in self.build(job.player, job.events):
+                await bucket.acquire()
+                try:
+                    with DISCORD_SEND_SECONDS.time(kind=kind):
+                        await job.channel.send(**kwargs)
+                except Exception as e:
+                    retry_after = getattr(e, "retry_after", None)
+                    if retry_after: bucket.hold(retry_after)
+                    raise
+        DISPATCH_SECONDS.observe(time.perf_counter() - job.queued)
+
+    async def close(self, timeout: float = 10):
+        # Arrêt du bot : on laisse partir ce qui est en file (borné par timeout), puis on coupe les workers
+        if self._queue is not None and self._tasks:
+            try:
+                await asyncio.wait_for(self._queue.join(), timeout)
+            except asyncio.TimeoutError:
+                print(f"{self._queue.qsize()} message(s) d'events non envoyés à l'arrêt")
+        for task in self._tasks: task.cancel()
+        self._tasks = []
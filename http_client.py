@@ -0,0 +1,178 @@
+# http_client.py
+import asyncio
+import random
+import time
+from email.utils import parsedate_to_datetime
+from typing import Dict, Mapping, Optional, Tuple
+from urllib.parse import urlparse
+import aiohttp
+
+RETRY_STATUSES = {500, 502, 503, 504, 520, 521, 522, 524}
+# Le site demande de ralentir (rate limit, blocage anti-bot) : échec pour le breaker, retry après le Retry-After
+THROTTLE_STATUSES = {403, 429}
+
+class CircuitOpenError(Exception):
+    """Le site est en pause après trop d'échecs consécutifs."""
+
+class CircuitBreaker:
+    """Coupe les requêtes vers une source pendant `cooldown` secondes après `threshold` échecs d'affilée.
+
+    Une fois le cooldown passé, une seule requête d'essai est autorisée (half-open), les autres sont refusées
+    tant qu'elle n'a pas abouti : succès -> circuit refermé, échec -> rouvert pour un nouveau cooldown.
+    """
+
+    def __init__(self, threshold: int = 3, cooldown: float = 300):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.trips = 0
+        # Début de la requête d'essai en cours (half-open) ; une requête annulée sans résultat
+        # ne bloque pas le circuit plus d'un cooldown
+        self.probe_at: Optional[float] = None
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None: return "closed"
+        if time.monotonic() - self.opened_at < self.cooldown: return "open"
+        return "half-open"
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == "closed": return True
+        if state == "open": return False
+        now = time.monotonic()
+        if self.probe_at is not None and now - self.probe_at < self.cooldown: return False
+        self.probe_at = now
+        return True
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self.probe_at = None
+
+    def record_failure(self):
+        self.failures += 1
+        self.probe_at = None
+        # En half-open, un seul échec suffit à rouvrir
+        if self.opened_at is not None or self.failures >= self.threshold:
+            if self.state != "open": self.trips += 1
+            self.opened_at = time.monotonic()
+
+def retry_after(headers: Mapping[str, str]) -> Optional[float]:
+    """Retry-After en secondes (nombre ou date HTTP), None s'il est absent ou illisible."""
+    value = headers.get("Retry-After")
+    if not value: return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+def source_key(url: str) -> str:
+    """'wank.wavu.wiki' -> 'wavu.wiki', 'www.ewgf.gg' -> 'ewgf.gg'."""
+    host = (urlparse(url).hostname or "").lower()
+    parts = host.split(".")
+    return ".".join(parts[-2:]) if len(parts) >= 2 else host
+
+class HttpClient:
+    """Session aiohttp partagée : pool de connexions, cache DNS, retries avec backoff et circuit breaker par source."""
+
+    def __init__(self, limit: int = 20, limit_per_host: int = 4, dns_ttl: int = 300, keepalive: float = 30,
+                 timeout: float = 20, retries: int = 2, backoff_base: float = 0.5, backoff_max: float = 8,
+                 breaker_threshold: int = 3, breaker_cooldown: float = 300, retry_after_max: float = 30):
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.dns_ttl = dns_ttl
+        self.keepalive = keepalive
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.breaker_threshold = breaker_threshold
+        self.breaker_cooldown = breaker_cooldown
+        # Retry-After plus long : pas d'attente dans la requête, la réponse 429 est renvoyée à l'appelant
+        self.retry_after_max = retry_after_max
+        self.breakers: Dict[str, CircuitBreaker] = {}
+        self._session: Optional[aiohttp.ClientSession] = None
+        self.retry_count = 0
+
+    @property
+    def closed(self) -> bool:
+        return self._session is None or self._session.closed
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        # Créée à la première requête, dans l'event loop du bot
+        if self.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.limit, limit_per_host=self.limit_per_host,
+                ttl_dns_cache=self.dns_ttl, keepalive_timeout=self.keepalive,
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self.timeout, connect=min(10, self.timeout)),
+            )
+        return self._session
+
+    def breaker_for(self, url: str, source: Optional[str] = None) -> CircuitBreaker:
+        key = source or source_key(url)
+        if key not in self.breakers:
+            self.breakers[key] = CircuitBreaker(self.breaker_threshold, self.breaker_cooldown)
+        return self.breakers[key]
+
+    def _backoff(self, attempt: int) -> float:
+        # Full jitter : uniforme entre 0 et le plafond exponentiel
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    async def get(self, url: str, headers: Optional[Dict[str, str]] = None,
+                  source: Optional[str] = None) -> Tuple[int, Mapping[str, str], Optional[str]]:
+        """GET avec retries sur 5xx / 429 / 403 / timeouts / erreurs réseau. Renvoie (status, headers, body).
+
+        Sur 429 / 403, le Retry-After est respecté avant l'essai suivant ; si la dernière réponse est encore
+        un 429 / 403, elle est renvoyée (body None) après avoir compté un échec pour le breaker.
+        Lève CircuitOpenError si la source est en pause, ou la dernière erreur si tous les essais échouent.
+        """
+        breaker = self.breaker_for(url, source)
+        if not breaker.allow():
+            raise CircuitOpenError(f"{source or source_key(url)} en pause ({breaker.failures} échecs)")
+
+        session = self._get_session()
+        last_error: Optional[Exception] = None
+        throttled = None
+        for attempt in range(self.retries + 1):
+            if attempt:
+                self.retry_count += 1
+                wait = self._backoff(attempt - 1)
+                if throttled is not None: wait = max(wait, retry_after(throttled[1]) or 0)
+                await asyncio.sleep(wait)
+            throttled = None
+            try:
+                async with session.get(url, headers=headers) as resp:
+                    if resp.status in THROTTLE_STATUSES:
+                        throttled = (resp.status, resp.headers.copy(), None)
+                        # Attente demandée trop longue pour un cycle : on rend la main tout de suite
+                        if (retry_after(throttled[1]) or 0) > self.retry_after_max: break
+                        continue
+                    if resp.status in RETRY_STATUSES:
+                        last_error = aiohttp.ClientResponseError(resp.request_info, resp.history, status=resp.status)
+                        continue
+                    body = await resp.text() if resp.status == 200 else None
+                    breaker.record_success()
+                    return resp.status, resp.headers.copy(), body
+            except (asyncio.TimeoutError, aiohttp.ClientError) as e:
+                last_error = e
+
+        breaker.record_failure()
+        if throttled is not None: return throttled
+        raise last_error or RuntimeError(f"GET {url} failed")
+
+    def circuit_states(self) -> Dict[str, str]:
+        return {key: b.state for key, b in self.breakers.items()}
+
+    async def close(self):
+        if not self.closed:
+            await self._session.close()
+        self._session = None
@@ -0,0 +1,193 @@
+# metrics.py
+import asyncio
+import functools
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Tuple
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+def _label_key(labels: Dict[str, str]) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+def _escape_label(value: str) -> str:
+    # Format texte Prometheus : \\, \" et \n dans les valeurs de labels (antislash d'abord)
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _format_labels(key: LabelKey, extra: Optional[Tuple[str, str]] = None) -> str:
+    items = list(key) + ([extra] if extra else [])
+    if not items: return ""
+    return "{" + ",".join(f'{k}="{_escape_label(v)}"' for k, v in items) + "}"
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help = help_text
+        self._lock = threading.Lock()  # Les parsers tournent dans des threads
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name, help_text):
+        super().__init__(name, help_text)
+        self.values: Dict[LabelKey, float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def get(self, **labels) -> float:
+        return self.values.get(_label_key(labels), 0)
+
+    def total(self) -> float:
+        return sum(self.values.values())
+
+    def render(self) -> List[str]:
+        return self.header() + [f"{self.name}{_format_labels(k)} {v}" for k, v in sorted(self.values.items())]
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self.values[_label_key(labels)] = value
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help_text, buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help_text)
+        self.buckets = tuple(buckets)
+        # clé -> [compteurs par bucket, somme, count, dernière valeur]
+        self.series: Dict[LabelKey, list] = {}
+
+    def observe(self, value: float, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            s = self.series.get(key)
+            if s is None:
+                s = self.series[key] = [[0] * len(self.buckets), 0.0, 0, 0.0]
+            for i, upper in enumerate(self.buckets):
+                if value <= upper: s[0][i] += 1
+            s[1] += value
+            s[2] += 1
+            s[3] = value
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def summary(self, **labels) -> Optional[Dict[str, float]]:
+        s = self.series.get(_label_key(labels))
+        if not s or not s[2]: return None
+        return {"count": s[2], "avg": s[1] / s[2], "last": s[3], "p90": self._quantile(s, 0.9)}
+
+    def _quantile(self, s, q: float) -> float:
+        # Borne haute du bucket qui contient le quantile (précision = largeur des buckets)
+        target = q * s[2]
+        for i, upper in enumerate(self.buckets):
+            if s[0][i] >= target: return upper
+        return float("inf")
+
+    def merged_summary(self) -> Optional[Dict[str, float]]:
+        count = sum(s[2] for s in self.series.values())
+        if not count: return None
+        total = sum(s[1] for s in self.series.values())
+        return {"count": count, "avg": total / count}
+
+    def render(self) -> List[str]:
+        lines = self.header()
+        for key, (counts, total, count, _) in sorted(self.series.items()):
+            for upper, c in zip(self.buckets, counts):
+                lines.append(f"{self.name}_bucket{_format_labels(key, ('le', repr(float(upper))))} {c}")
+            lines.append(f"{self.name}_bucket{_format_labels(key, ('le', '+Inf'))} {count}")
+            lines.append(f"{self.name}_sum{_format_labels(key)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {count}")
+        return lines
+
+class MetricsRegistry:
+    def __init__(self):
+        self.metrics: Dict[str, _Metric] = {}
+        self._collectors: List[Callable[[], None]] = []
+
+    def _get(self, cls, name, help_text, **kwargs):
+        metric = self.metrics.get(name)
+        if metric is None:
+            metric = self.metrics[name] = cls(name, help_text, **kwargs)
+        return metric
+
+    def counter(self, name: str, help_text: str = "") -> Counter:
+        return self._get(Counter, name, help_text)
+
+    def gauge(self, name: str, help_text: str = "") -> Gauge:
+        return self._get(Gauge, name, help_text)
+
+    def histogram(self, name: str, help_text: str = "", buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self._get(Histogram, name, help_text, buckets=buckets)
+
+    def add_collector(self, fn: Callable[[], None]):
+        """fn est appelée avant chaque export (pour recopier des compteurs tenus ailleurs dans des gauges)."""
+        self._collectors.append(fn)
+
+    def collect(self):
+        for fn in self._collectors:
+            try:
+                fn()
+            except Exception as e:
+                print(f"Metrics collector error: {e}")
+
+    def render_prometheus(self) -> str:
+        self.collect()
+        lines = []
+        for name in sorted(self.metrics):
+            lines.extend(self.metrics[name].render())
+        return "\n".join(lines) + "\n"
+
+REGISTRY = MetricsRegistry()
+
+def timed(histogram_name: str, help_text: str = "", **labels):
+    """Décorateur (sync ou async) qui mesure la durée des appels dans un histogramme du REGISTRY."""
+    hist = REGISTRY.histogram(histogram_name, help_text)
+
+    def decorator(fn):
+        if asyncio.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with hist.time(**labels):
+                    return await fn(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with hist.time(**labels):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+async def start_metrics_server(host: str = "127.0.0.1", port: int = 9108, registry: MetricsRegistry = REGISTRY):
+    """Expose GET /metrics au format texte Prometheus. Renvoie le runner aiohttp (à cleanup à l'arrêt)."""
+    from aiohttp import web
+
+    async def handle_metrics(request):
+        return web.Response(text=registry.render_prometheus(),
+                            headers={"Content-Type": "text/plain; version=0.0.4; charset=utf-8"})
+
+    app = web.Application()
+    app.router.add_get("/metrics", handle_metrics)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return runner
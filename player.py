@@ -1,7 +1,283 @@
 # player.py
 from typing import List, Dict, Optional
-from datetime import datetime
-import copy
+from datetime import datetime, timedelta, date
+from heapq import merge
+from itertools import islice
+from operator import attrgetter
+import hashlib
+import pytz
+from data_fetcher import Game, game_uid
+
+# Format du cache : v1 = ancien dump de __dict__ (sans clé "v"), v2 = champs explicites ci-dessous,
+# v3 = seen_game_ids remplacé par l'index de dédup (dans le résumé), v4 = matchs en lignes (Game.to_row),
+# v5 = compteurs all-time (Aggregates) dans le résumé, v6 = compteurs par jour / heure (Rollups)
+SCHEMA_VERSION = 6
+STATE_FIELDS = (
+    "ewgf_rank", "last_ewgf_rank", "rating_mu", "main_char", "matchups", "pentagon_stats", "watermarks",
+    "current_lose_streak", "current_win_streak", "last_daily_report_date", "daily_snapshot",
+    "weekly_snapshot", "last_weekly_report_date",
+)
+# Nombre de matchs gardés en mémoire par joueur
+MAX_GAMES = 1500
+_ts = attrgetter("timestamp_unix")
+TZ_PARIS = pytz.timezone("Europe/Paris")
+def load_game(g) -> Optional[Game]:
+    # Match relu du disque (ligne v4 ou dict v1-v3) -> Game validé (chaînes internées) ; None si inutilisable
+    try:
+        if type(g) is list:
+            if type(g[0]) is not int or type(g[2]) is not int: return None
+            return Game.from_row(g)
+        ts, result, opponent = g['timestamp_unix'], g['result'], g['opponent']
+        if type(ts) not in (int, float) or type(result) is not str or type(opponent) is not str:
+            return None
+        return Game.from_dict(g)
+    except (KeyError, TypeError, ValueError, IndexError):
+        return None
+
+class DedupIndex:
+    # Remplace l'ancien set seen_game_ids (qui grossissait sans fin) :
+    # - tout match plus vieux que max_ts - window est considéré comme déjà vu ;
+    # - au-dessus, un dict hash 64 bits de l'uid -> timestamp, purgé quand la fenêtre avance.
+    # La mémoire ne dépend que du nombre de matchs joués sur la fenêtre.
+    # Un match déjà vu avec le même adversaire et le même score à TOLERANCE secondes près est aussi
+    # un doublon : le même match vu par l'autre site avec une horloge décalée, à un autre cycle.
+    WINDOW = 7 * 86400
+    TOLERANCE = 60
+    PRUNE_EVERY = 3600
+
+    def __init__(self, window: int = None):
+        self.window = window or self.WINDOW
+        self.max_ts = 0
+        self.recent: Dict[int, int] = {}
+        # hash 64 bits de "adversaire_score" -> timestamps vus dans la fenêtre
+        self.near: Dict[int, List[int]] = {}
+        self._pruned_at = 0
+
+    @property
+    def floor(self) -> int:
+        return self.max_ts - self.window if self.max_ts else 0
+
+    def add(self, g, floor: int = None) -> bool:
+        # True si le match est nouveau (et l'enregistre)
+        if type(g) is Game: return self.add_uid(g.uid, g.timestamp_unix, floor)
+        return self.add_uid(game_uid(g), int(g['timestamp_unix']), floor)
+
+    def add_all(self, games) -> list:
+        # Lot de matchs (une page) : seul le plancher d'avant le lot compte, sinon le match le plus récent
+        # du lot ferait rejeter les plus anciens de la même page (nouveau joueur, index perdu)
+        floor = self.floor
+        fresh = [g for g in games if self.add(g, floor)]
+        if self.max_ts - self._pruned_at >= self.PRUNE_EVERY: self.prune()
+        return fresh
+
+    def add_uid(self, uid: str, ts: int, floor: int = None) -> bool:
+        # floor donné (add_all) : pas de purge pendant le lot, faite à la fin
+        batch = floor is not None
+        if ts < (floor if batch else self.floor): return False
+        h = _hash64(uid)
+        if h in self.recent: return False
+        # uid = "<timestamp>_<adversaire>_<score>"
+        k = _hash64(uid.split("_", 1)[-1])
+        seen = self.near.get(k)
+        if seen is not None:
+            tolerance = self.TOLERANCE
+            for t in seen:
+                if -tolerance <= t - ts <= tolerance: return False
+            seen.append(ts)
+        else:
+            self.near[k] = [ts]
+        self.recent[h] = ts
+        if ts > self.max_ts:
+            self.max_ts = ts
+            if not batch and ts - self._pruned_at >= self.PRUNE_EVERY: self.prune()
+        return True
+
+    def prune(self):
+        floor = self.floor
+        self.recent = {h: ts for h, ts in self.recent.items() if ts >= floor}
+        near = {}
+        for k, seen in self.near.items():
+            kept = [t for t in seen if t >= floor]
+            if kept: near[k] = kept
+        self.near = near
+        self._pruned_at = self.max_ts
+
+    def __len__(self):
+        return len(self.recent)
+
+    def to_dict(self):
+        return {"max_ts": self.max_ts, "recent": [[ts, h] for h, ts in self.recent.items()],
+                "near": [[k, seen] for k, seen in self.near.items()]}
+
+    @classmethod
+    def from_dict(cls, d):
+        idx = cls()
+        idx.max_ts = d.get("max_ts") or 0
+        idx.recent = {h: ts for ts, h in d.get("recent") or []}
+        idx.near = {k: seen for k, seen in d.get("near") or []}
+        idx._pruned_at = idx.max_ts
+        return idx
+
+    @classmethod
+    def from_uids(cls, uids):
+        # Migration depuis seen_game_ids : le timestamp est le préfixe de l'uid
+        items = []
+        for uid in uids:
+            try:
+                items.append((int(float(uid.split("_", 1)[0])), uid))
+            except ValueError:
+                continue
+        idx = cls()
+        idx.max_ts = max((ts for ts, _ in items), default=0)
+        for ts, uid in items: idx.add_uid(uid, ts)
+        return idx
+
+def _hash64(text: str) -> int:
+    return int.from_bytes(hashlib.blake2b(text.encode(), digest_size=8).digest(), "little")
+
+class Aggregates:
+    # Compteurs all-time mis à jour à chaque nouveau match : /tekken_stats et /tekken_status
+    # n'ont plus à parcourir l'historique. Tranches horaires de 6h (heure de Paris) :
+    # 0 = nuit (00-06h), 1 = matin, 2 = midi, 3 = soir.
+    def __init__(self):
+        self.total = 0
+        self.wins = 0
+        # Matchs décisifs : 5 rounds joués (3-2 / 2-3)
+        self.clutch_total = 0
+        self.clutch_wins = 0
+        self.slots = [[0, 0] for _ in range(4)]  # [wins, total]
+
+    def add(self, g: Game, hour: int = None):
+        if hour is None: hour = datetime.fromtimestamp(g.timestamp_unix, tz=TZ_PARIS).hour
+        win = g.result_code == 1
+        self.total += 1
+        self.wins += win
+        if g.my_rounds is not None and g.opp_rounds is not None and g.my_rounds + g.opp_rounds == 5:
+            self.clutch_total += 1
+            self.clutch_wins += win
+        slot = self.slots[hour // 6]
+        slot[0] += win
+        slot[1] += 1
+
+    @property
+    def losses(self) -> int:
+        return self.total - self.wins
+
+    @property
+    def winrate(self) -> float:
+        return round(self.wins / self.total * 100, 1) if self.total else 0.0
+
+    @classmethod
+    def from_games(cls, games):
+        agg = cls()
+        for g in games: agg.add(g)
+        return agg
+
+    def to_dict(self):
+        return {"total": self.total, "wins": self.wins, "clutch": [self.clutch_wins, self.clutch_total], "slots": self.slots}
+
+    @classmethod
+    def from_dict(cls, d):
+        agg = cls()
+        agg.total = int(d.get("total") or 0)
+        agg.wins = int(d.get("wins") or 0)
+        agg.clutch_wins, agg.clutch_total = d.get("clutch") or (0, 0)
+        slots = d.get("slots")
+        if isinstance(slots, list) and len(slots) == 4: agg.slots = [[int(w), int(t)] for w, t in slots]
+        return agg
+
+class Rollups:
+    # Compteurs par jour (heure de Paris) et par heure, tenus à jour à l'ingestion : les rapports
+    # daily / weekly, y compris pour un jour passé, additionnent des buckets au lieu de relire les matchs.
+    KEEP_DAYS = 35
+    # Compteurs d'un bucket horaire
+    FIELDS = ("total", "wins", "losses", "close_losses", "clutch_total", "clutch_wins")
+    CLOSE_SCORES = ((2, 3), (1, 2))
+
+    def __init__(self):
+        # "YYYY-MM-DD" -> {"hours": {heure: compteurs}, "chars": {perso adverse: [wins, total]}, "ranks": {rang adverse: wins}}
+        self.days: Dict[str, Dict] = {}
+        self._newest = ""
+        self._floor = ""
+
+    def add(self, g: Game, local: datetime = None):
+        if local is None: local = datetime.fromtimestamp(g.timestamp_unix, tz=TZ_PARIS)
+        key = local.date().isoformat()
+        if key < self._floor: return
+        day = self.days.get(key)
+        if day is None:
+            day = self.days[key] = {"hours": {}, "chars": {}, "ranks": {}}
+            if key > self._newest: self._prune(local.date())
+        b = day["hours"].get(local.hour)
+        if b is None: b = day["hours"][local.hour] = [0] * len(self.FIELDS)
+        win, loss = g.result_code == 1, g.result_code == 0
+        b[0] += 1
+        b[1] += win
+        b[2] += loss
+        if loss and (g.my_rounds, g.opp_rounds) in self.CLOSE_SCORES: b[3] += 1
+        if g.my_rounds is not None and g.opp_rounds is not None and g.my_rounds + g.opp_rounds == 5:
+            b[4] += 1
+            b[5] += win
+        if g.opponent_char:
+            c = day["chars"].get(g.opponent_char)
+            if c is None: c = day["chars"][g.opponent_char] = [0, 0]
+            c[0] += win
+            c[1] += 1
+        if win and g.opponent_rank:
+            day["ranks"][g.opponent_rank] = day["ranks"].get(g.opponent_rank, 0) + 1
+
+    def _prune(self, newest: date):
+        self._newest = newest.isoformat()
+        self._floor = (newest - timedelta(days=self.KEEP_DAYS - 1)).isoformat()
+        for key in [k for k in self.days if k < self._floor]: del self.days[key]
+
+    def window(self, first: date, last: date, points: bool = False) -> Dict:
+        # Buckets des jours first..last (inclus) additionnés ;
+        # avec points=True, "points" = (timestamp de l'heure, victoires - défaites) pour le graphique
+        out = dict.fromkeys(self.FIELDS, 0)
+        out.update(periods=[[0, 0] for _ in range(4)], chars={}, ranks={}, points=[])
+        for i in range((last - first).days + 1):
+            day = first + timedelta(days=i)
+            d = self.days.get(day.isoformat())
+            if not d: continue
+            if points: midnight = TZ_PARIS.localize(datetime(day.year, day.month, day.day)).timestamp()
+            for hour in sorted(d["hours"]):
+                b = d["hours"][hour]
+                for f, n in zip(self.FIELDS, b): out[f] += n
+                period = out["periods"][hour // 6]
+                period[0] += b[1]
+                period[1] += b[0]
+                if points: out["points"].append((midnight + hour * 3600, 2 * b[1] - b[0]))
+            for char, (w, t) in d["chars"].items():
+                c = out["chars"].setdefault(char, [0, 0])
+                c[0] += w
+                c[1] += t
+            for rank, w in d["ranks"].items(): out["ranks"][rank] = out["ranks"].get(rank, 0) + w
+        return out
+
+    @classmethod
+    def from_games(cls, games):
+        rollups = cls()
+        for g in games: rollups.add(g)
+        return rollups
+
+    def to_dict(self):
+        return {key: {"hours": [[h] + b for h, b in d["hours"].items()], "chars": d["chars"], "ranks": d["ranks"]}
+                for key, d in self.days.items()}
+
+    @classmethod
+    def from_dict(cls, d):
+        rollups = cls()
+        for key, day in d.items():
+            rollups.days[key] = {"hours": {row[0]: row[1:] for row in day.get("hours") or []},
+                                 "chars": day.get("chars") or {}, "ranks": day.get("ranks") or {}}
+        if rollups.days: rollups._prune(date.fromisoformat(max(rollups.days)))
+        return rollups
+
+def _count_into(aggregates, rollups, g):
+    local = datetime.fromtimestamp(g.timestamp_unix, tz=TZ_PARIS)
+    aggregates.add(g, local.hour)
+    rollups.add(g, local)
 
 class Player:
     RANK_TIERS_ORDER = [
@@ -20,12 +296,30 @@ class Player:
         self.rating_mu: Optional[float] = None
         self.main_char: Optional[str] = None
 
-        self.games: List[Dict] = []
-        self.seen_game_ids: set = set()
+        self._games: List[Dict] = []
+        # Dédup des matchs, indépendant de l'historique (toujours en mémoire, taille bornée)
+        self.dedup = DedupIndex()
+        # Winrate, clutch et prime time all-time, tenus à jour par add_games
+        self.aggregates = Aggregates()
+        # Compteurs par jour / heure des KEEP_DAYS derniers jours, pour les rapports
+        self.rollups = Rollups()
+        # Démarrage lazy : fonction qui renvoie la liste des matchs, appelée au premier accès
+        self._history_loader = None
+        # Matchs reçus ou relus du disque (journal) avant que l'historique soit chargé (MAX_GAMES plus récents)
+        self._lazy_games: List[Dict] = []
+        # False si le loader relit déjà tout (SQLite) : seuls les matchs pas encore écrits sont à fusionner
+        self.keep_lazy_games = True
+        # Matchs ajoutés depuis la dernière sauvegarde (vidé par le store)
+        self.pending_games: List[Dict] = []
+        # True si l'état a changé depuis la dernière sauvegarde
+        self.dirty: bool = True
         
         self.matchups: Dict = {}
         self.pentagon_stats: Dict = {}
 
+        # Watermark par source : timestamp du match le plus récent déjà parsé
+        self.watermarks: Dict[str, int] = {}
+
         self.current_lose_streak: int = 0
         self.current_win_streak: int = 0
         
@@ -36,7 +330,96 @@ class Player:
         self.weekly_snapshot: Dict = {}
         self.last_weekly_report_date: Optional[str] = None
 
+    # --- HISTORIQUE (chargé à la demande) ---
+    @property
+    def history_loaded(self) -> bool:
+        return self._history_loader is None
+
+    def set_history_loader(self, loader, keep_lazy_games=True):
+        self._history_loader = loader
+        self.keep_lazy_games = keep_lazy_games
+
+    def load_history(self):
+        if self._history_loader is None: return
+        games = self._history_loader()
+        self._history_loader = None
+        self._games = games
+        # Sans liste lazy, les matchs pas encore sauvegardés manquent à la relecture (dédupliqués sinon)
+        extra = self._lazy_games if self.keep_lazy_games else list(self.pending_games)
+        self._lazy_games = []
+        if extra: self._merge_history(extra)
+
+    @property
+    def games(self) -> List[Dict]:
+        self.load_history()
+        return self._games
+
+    @games.setter
+    def games(self, value):
+        self.load_history()
+        self._games = value
+
+    @property
+    def last_game_ts(self) -> float:
+        # Sans charger l'historique : les watermarks suivent le match le plus récent de chaque source
+        if self.history_loaded and self._games: return self._games[0]['timestamp_unix']
+        return max(self.watermarks.values(), default=0)
+
+    def restore_games(self, games: List[Dict]):
+        # Matchs relus du disque : ni events ni streaks, juste la dédup et l'historique
+        # Compté seulement si l'index ne le connaît pas (journal rejoué sur un snapshot qui l'inclut déjà)
+        for g in self.dedup.add_all(games): self._count(g)
+        self._merge_history(games)
+
+    def _count(self, g: Game):
+        _count_into(self.aggregates, self.rollups, g)
+
+    @staticmethod
+    def count_games(games):
+        # Compteurs neufs d'un itérable de matchs, sans toucher au joueur : peut tourner dans un thread
+        aggregates, rollups = Aggregates(), Rollups()
+        for g in games: _count_into(aggregates, rollups, g)
+        return aggregates, rollups
+
+    def rebuild_aggregates(self, games=None):
+        # Commande admin : recalcule les compteurs depuis l'historique gardé (MAX_GAMES matchs),
+        # ou depuis un itérable de matchs (historique complet lu en base par morceaux après un backfill)
+        self.aggregates, self.rollups = self.count_games(self.games if games is None else games)
+        self.dirty = True
+
+    def _merge_history(self, games: List[Game], dedupe: bool = True):
+        if not self.history_loaded:
+            if not self.keep_lazy_games: return
+            lazy = self._lazy_games
+            lazy.extend(games)
+            # Borné comme l'historique : seuls les MAX_GAMES plus récents survivront au chargement
+            if len(lazy) > MAX_GAMES:
+                lazy.sort(key=_ts, reverse=True)
+                del lazy[MAX_GAMES:]
+            return
+        if dedupe:
+            # Un match peut déjà être dans l'historique (journal rejoué sur un snapshot plus récent)
+            known = {g.uid for g in self._games}
+            fresh = []
+            for g in games:
+                if g.uid not in known:
+                    known.add(g.uid)
+                    fresh.append(g)
+            games = fresh
+        if not games: return
+        # Historique trié du plus récent au plus ancien : fusion linéaire avec le lot trié, coupée à MAX_GAMES
+        batch = sorted(games, key=_ts, reverse=True)
+        history = self._games
+        if not history or _ts(batch[-1]) >= _ts(history[0]):
+            # Cas courant : tout le lot est plus récent que l'historique
+            history[:0] = batch
+            del history[MAX_GAMES:]
+        else:
+            self._games = list(islice(merge(history, batch, key=_ts, reverse=True), MAX_GAMES))
+
     def update_stats(self, rank: str, rating: float, main_char: str, matchups: Dict, pentagon: Dict):
+        before = (self.ewgf_rank, self.last_ewgf_rank, self.rating_mu, self.main_char, self.daily_snapshot, self.weekly_snapshot)
+
         # 1. Gestion du Daily Snapshot (Le rang du matin)
         today = datetime.now().strftime("%Y-%m-%d")
         
@@ -58,8 +441,12 @@ class Player:
         if main_char: self.main_char = main_char
         
         # Update New Stats
-        if matchups: self.matchups = matchups
-        if pentagon: self.pentagon_stats = pentagon
+        if matchups and matchups != self.matchups:
+            self.matchups = matchups
+            self.dirty = True
+        if pentagon and pentagon != self.pentagon_stats:
+            self.pentagon_stats = pentagon
+            self.dirty = True
             
         # Weekly Snapshot
         if not self.weekly_snapshot and self.ewgf_rank:
@@ -68,31 +455,28 @@ class Player:
                 "rank": self.ewgf_rank
             }
 
+        if before != (self.ewgf_rank, self.last_ewgf_rank, self.rating_mu, self.main_char, self.daily_snapshot, self.weekly_snapshot):
+            self.dirty = True
+
     def add_games(self, new_games: List[dict]) -> List[tuple]:
         events = []
         truly_new_games = []
         
-        # Le nom de l'adversaire est déjà nettoyé dans data_fetcher pour la clé, 
-        # mais on recrée l'ID ici de la même façon pour le set seen_game_ids
-        import re
-        for g in new_games:
-            opp_clean = re.sub(r'\W+', '', g['opponent']).lower()
-            uid = f"{g['timestamp_unix']}_{opp_clean}_{g['score']}"
-            
-            if uid not in self.seen_game_ids:
-                self.seen_game_ids.add(uid)
-                truly_new_games.append(g)
+        for g in self.dedup.add_all(new_games):
+            truly_new_games.append(g if type(g) is Game else Game.from_dict(g))
 
         if not truly_new_games: return []
 
-        truly_new_games.sort(key=lambda x: x['timestamp_unix'])
+        truly_new_games.sort(key=_ts)
+        self.pending_games.extend(truly_new_games)
+        self.dirty = True
         
         now_ts = datetime.now().timestamp()
         NOTIFICATION_THRESHOLD = 1800 # 30 minutes
 
         for g in truly_new_games:
-            self.games.insert(0, g)
-            
+            self._count(g)
+
             # --- FILTRE DE FRAICHEUR ---
             # Si le match date de plus de 30 min, on ne notifie PAS (on update juste stats/streak interne)
             is_fresh = (now_ts - g['timestamp_unix']) < NOTIFICATION_THRESHOLD
@@ -123,8 +507,8 @@ class Player:
                     elif self.current_lose_streak == 8: events.append(("lose_streak_8", 8))
                     elif self.current_lose_streak == 10: events.append(("lose_streak_10", 10))
 
-        self.games.sort(key=lambda x: x['timestamp_unix'], reverse=True)
-        self.games = self.games[:1500]
+        # L'index de dédup garantit qu'ils sont nouveaux ; historique non chargé -> mis de côté
+        self._merge_history(truly_new_games, dedupe=False)
         
         return events
 
@@ -152,6 +536,7 @@ class Player:
             # CRUCIAL : On met à jour last_ewgf_rank ICI pour dire "C'est bon, j'ai vu le changement"
             # Cela empêche de redéclencher l'event à la prochaine boucle
             self.last_ewgf_rank = self.ewgf_rank
+            self.dirty = True
             
         except ValueError:
             # Si un rang n'est pas dans la liste (ex: un nouveau rang ajouté par le jeu), on ignore
@@ -163,16 +548,54 @@ class Player:
         if not rank_name or rank_name not in self.RANK_TIERS_ORDER: return -1
         return self.RANK_TIERS_ORDER.index(rank_name)
 
+    def summary_dict(self):
+        # Tout sauf l'historique : suffisant pour démarrer
+        d = {"v": SCHEMA_VERSION, "name": self.name}
+        for f in STATE_FIELDS: d[f] = getattr(self, f)
+        d["dedup"] = self.dedup.to_dict()
+        d["aggregates"] = self.aggregates.to_dict()
+        d["rollups"] = self.rollups.to_dict()
+        return d
+
+    def history_dict(self):
+        return {"games": [g.to_row() for g in self.games]}
+
     def to_dict(self):
-        d = copy.deepcopy(self.__dict__)
-        d['seen_game_ids'] = list(self.seen_game_ids)
+        # Vue à plat sur l'état courant, sans copie profonde : les dicts sont ceux du joueur,
+        # à encoder tout de suite (avant la prochaine mutation)
+        d = self.summary_dict()
+        d.update(self.history_dict())
         return d
 
     @classmethod
     def from_dict(cls, d):
+        version = d.get("v", 1)
+        if version > SCHEMA_VERSION:
+            raise ValueError(f"Cache de {d.get('name')} en version {version}, non supportée (max {SCHEMA_VERSION})")
         p = cls(d["name"])
-        p.__dict__.update(d)
-        p.seen_game_ids = set(d.get("seen_game_ids", []))
-        # Récupération du snapshot s'il existe dans le cache
-        p.daily_snapshot = d.get("daily_snapshot", {}) 
-        return p
\ No newline at end of file
+        for f in STATE_FIELDS:
+            if f in d: setattr(p, f, d[f])
+        # Les champs optionnels null dans un vieux cache reprennent leur valeur par défaut
+        for f in ("matchups", "pentagon_stats", "watermarks", "daily_snapshot", "weekly_snapshot"):
+            if not isinstance(getattr(p, f), dict): setattr(p, f, {})
+        p.current_win_streak = int(p.current_win_streak or 0)
+        p.current_lose_streak = int(p.current_lose_streak or 0)
+
+        if "games" in d:
+            p.games = load_history_dict(d, p.name)
+        if isinstance(d.get("dedup"), dict):
+            p.dedup = DedupIndex.from_dict(d["dedup"])
+        else:
+            # v1 / v2 : on reconstruit l'index depuis l'ancien set d'uids et l'historique
+            p.dedup = DedupIndex.from_uids(d.get("seen_game_ids") or [])
+            p.dedup.add_all(p._games)
+        # Cache sans compteurs : calculés une fois depuis l'historique
+        for f, cls_ in (("aggregates", Aggregates), ("rollups", Rollups)):
+            setattr(p, f, cls_.from_dict(d[f]) if isinstance(d.get(f), dict) else cls_.from_games(p._games))
+        return p
+
+def load_history_dict(d, name=""):
+    games = [g for g in map(load_game, d.get("games") or []) if g is not None]
+    if len(games) != len(d.get("games") or []):
+        print(f"Cache {name} : {len(d['games']) - len(games)} match(s) invalide(s) ignoré(s)")
+    return games
@@ -0,0 +1,72 @@
+# scheduler.py
+import heapq
+import random
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+class PollScheduler:
+    """File de priorité des prochains refresh, par joueur.
+
+    Un joueur actif (match il y a moins de `activity_threshold` s) est rafraîchi toutes les
+    `active_interval` s. Sinon l'intervalle part de `idle_interval` et double à chaque refresh
+    sans nouveauté, jusqu'à `sleep_interval`. Un jitter évite que tout le monde tombe en même temps.
+    """
+
+    def __init__(self, names: Iterable[str], active_interval: float, idle_interval: float,
+                 sleep_interval: float, activity_threshold: float, jitter: float = 0.1):
+        self.active_interval = active_interval
+        self.idle_interval = max(idle_interval, active_interval)
+        self.sleep_interval = max(sleep_interval, self.idle_interval)
+        self.activity_threshold = activity_threshold
+        self.jitter = jitter
+        self._heap: List[Tuple[float, int, str]] = []
+        self._deadlines: Dict[str, float] = {}
+        self._intervals: Dict[str, float] = {}
+        self._seq = 0
+        now = time.time()
+        for name in names:
+            self._push(name, now)
+
+    def _push(self, name: str, deadline: float):
+        self._seq += 1
+        self._deadlines[name] = deadline
+        heapq.heappush(self._heap, (deadline, self._seq, name))
+
+    def pop_due(self, now: Optional[float] = None) -> List[str]:
+        """Retire et renvoie les joueurs dont l'échéance est passée."""
+        now = time.time() if now is None else now
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            deadline, _, name = heapq.heappop(self._heap)
+            # Entrée obsolète (le joueur a été replanifié entre-temps)
+            if self._deadlines.get(name) != deadline: continue
+            del self._deadlines[name]
+            due.append(name)
+        return due
+
+    def next_interval(self, name: str, last_game_ts: float, now: float) -> float:
+        if last_game_ts and now - last_game_ts < self.activity_threshold:
+            interval = self.active_interval
+        else:
+            previous = self._intervals.get(name)
+            interval = self.idle_interval if previous is None or previous < self.idle_interval else previous * 2
+            interval = min(interval, self.sleep_interval)
+        self._intervals[name] = interval
+        return interval
+
+    def reschedule(self, name: str, last_game_ts: float, now: Optional[float] = None) -> float:
+        now = time.time() if now is None else now
+        interval = self.next_interval(name, last_game_ts, now)
+        delay = interval * random.uniform(1 - self.jitter, 1 + self.jitter)
+        self._push(name, now + delay)
+        return delay
+
+    def seconds_until_next(self, now: Optional[float] = None) -> Optional[float]:
+        now = time.time() if now is None else now
+        while self._heap and self._deadlines.get(self._heap[0][2]) != self._heap[0][0]:
+            heapq.heappop(self._heap)
+        if not self._heap: return None
+        return max(0.0, self._heap[0][0] - now)
+
+    def active_count(self) -> int:
+        return sum(1 for i in self._intervals.values() if i <= self.active_interval)
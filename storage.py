@@ -0,0 +1,826 @@
+# storage.py
+# Persistance des joueurs : cache.json (historique), cache.json + journal, ou base SQLite.
+# Avec le journal ou SQLite, une sauvegarde n'écrit que les nouveaux matchs et les champs
+# joueur qui ont changé.
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from player import Player, Aggregates, Rollups, load_game, load_history_dict, STATE_FIELDS, SCHEMA_VERSION, MAX_GAMES
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS players (
+    name TEXT PRIMARY KEY,
+    ewgf_rank TEXT,
+    last_ewgf_rank TEXT,
+    rating_mu REAL,
+    main_char TEXT,
+    current_win_streak INTEGER NOT NULL DEFAULT 0,
+    current_lose_streak INTEGER NOT NULL DEFAULT 0,
+    watermarks TEXT NOT NULL DEFAULT '{}',
+    matchups TEXT NOT NULL DEFAULT '{}',
+    pentagon_stats TEXT NOT NULL DEFAULT '{}',
+    aggregates TEXT,
+    rollups TEXT
+);
+CREATE TABLE IF NOT EXISTS games (
+    id INTEGER PRIMARY KEY,
+    player TEXT NOT NULL,
+    uid TEXT NOT NULL,
+    timestamp_unix INTEGER NOT NULL,
+    timestamp_iso TEXT,
+    result TEXT NOT NULL,
+    score TEXT,
+    opponent TEXT,
+    opponent_char TEXT,
+    opponent_rank TEXT,
+    my_char TEXT,
+    source TEXT,
+    UNIQUE (player, uid)
+);
+CREATE INDEX IF NOT EXISTS games_player_ts ON games (player, timestamp_unix);
+CREATE TABLE IF NOT EXISTS rank_snapshots (
+    player TEXT NOT NULL,
+    ts INTEGER NOT NULL,
+    rank TEXT,
+    rating_mu REAL
+);
+CREATE INDEX IF NOT EXISTS rank_snapshots_player_ts ON rank_snapshots (player, ts);
+CREATE TABLE IF NOT EXISTS report_state (
+    player TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    last_report_date TEXT,
+    snapshot TEXT NOT NULL DEFAULT '{}',
+    PRIMARY KEY (player, kind)
+);
+"""
+
+PLAYER_FIELDS = ("ewgf_rank", "last_ewgf_rank", "rating_mu", "main_char", "current_win_streak", "current_lose_streak")
+PLAYER_JSON_FIELDS = ("watermarks", "matchups", "pentagon_stats")
+# Compteurs dérivés des matchs (JSON, recalculés depuis la table games si absents)
+DERIVED_FIELDS = {"aggregates": Aggregates, "rollups": Rollups}
+GAME_FIELDS = ("timestamp_unix", "timestamp_iso", "result", "score", "opponent", "opponent_char", "opponent_rank", "my_char", "source")
+
+
+class JsonStore:
+    # Fichier JSON Lines : une ligne d'en-tête, puis pour chaque joueur une ligne résumé (rang, streaks,
+    # snapshots, watermarks) et une ligne historique (matchs + ids vus). Au démarrage seules les lignes
+    # résumé sont décodées ; l'historique reste en texte brut jusqu'au premier accès. Les matchs reçus
+    # entre-temps sont écrits dans le résumé ("lazy_games") et fusionnés à l'historique à son chargement.
+    # Chaque joueur est gardé sérialisé et n'est réencodé que s'il est dirty.
+    HEADER = {"layout": "lines", "v": SCHEMA_VERSION}
+
+    def __init__(self, path):
+        self.path = path
+        self._fragments = {}
+        self._raw_history = {}
+
+    def load(self, names):
+        players = {}
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, "r") as f:
+                    first = f.readline()
+                    try:
+                        header = json.loads(first)
+                    except ValueError:
+                        header = None
+                    if isinstance(header, dict) and header.get("layout") == "lines":
+                        for summary in f:
+                            history = f.readline()
+                            d = json.loads(summary)
+                            name = d["name"]
+                            if names is not None and name not in names: continue
+                            lazy = [g for g in map(load_game, d.pop("lazy_games", None) or []) if g is not None]
+                            if any(f not in d for f in ("dedup",) + tuple(DERIVED_FIELDS)):
+                                # Résumé v2-v5 sans index de dédup ou sans compteurs : historique décodé tout de suite pour les construire
+                                d.update(json.loads(history))
+                                p = players[name] = Player.from_dict(d)
+                            else:
+                                p = players[name] = Player.from_dict(d)
+                                self._raw_history[name] = history.rstrip("\n")
+                                p.set_history_loader(lambda name=name: self._load_history(name))
+                            # Déjà comptés dans les compteurs et l'index du résumé : seulement l'historique
+                            if lazy: p._merge_history(lazy)
+                    else:
+                        # Ancien format (un seul objet JSON) : tout est chargé, réécrit en lignes à la prochaine sauvegarde
+                        f.seek(0)
+                        for name, p_data in json.load(f).items():
+                            if names is None or name in names: players[name] = Player.from_dict(p_data)
+                for p in players.values(): p.dirty = False
+            except Exception as e:
+                print(f"Cache load error: {e}")
+        return players
+
+    def _load_history(self, name):
+        games = load_history_dict(json.loads(self._raw_history[name]), name)
+        del self._raw_history[name]
+        return games
+
+    def snapshot(self, players, dirty):
+        # Sur l'event loop : fige l'état à écrire (les joueurs propres réutilisent leur fragment)
+        for name, p in players.items():
+            if name in dirty or name not in self._fragments:
+                if p.history_loaded:
+                    summary = json.dumps(p.summary_dict())
+                    history = json.dumps(p.history_dict())
+                else:
+                    # Historique jamais chargé : on recopie le texte lu au démarrage, sans le décoder,
+                    # et les matchs reçus depuis vont dans le résumé
+                    d = p.summary_dict()
+                    if p._lazy_games: d["lazy_games"] = [g.to_row() for g in p._lazy_games]
+                    summary = json.dumps(d)
+                    history = self._raw_history[name]
+                self._fragments[name] = f"{summary}\n{history}\n"
+            p.pending_games.clear()
+        return json.dumps(self.HEADER) + "\n" + "".join(self._fragments[name] for name in players)
+
+    def write(self, text):
+        atomic_write(self.path, text)
+
+    def invalidate(self, names):
+        for name in names: self._fragments.pop(name, None)
+
+    def restore(self, batch, players):
+        # Le prochain snapshot réécrit tout le fichier : rien à remettre en file
+        pass
+
+    def save(self, players):
+        self.write(self.snapshot(players, set(players)))
+
+    def close(self):
+        pass
+
+
+class JournalStore:
+    # cache.json sert de snapshot ; les nouveaux matchs, changements de rang et champs modifiés
+    # sont ajoutés en fin de journal (une ligne JSON par enregistrement). Au-delà de max_bytes,
+    # un snapshot complet est réécrit et le journal repart de zéro.
+    # Rejouer un journal déjà inclus dans le snapshot ne change rien (matchs dédupliqués par uid,
+    # champs écrasés par leur dernière valeur) : un crash pendant la compaction est sans danger.
+    def __init__(self, snapshot_path, journal_path, max_bytes=4 * 2**20):
+        self.base = JsonStore(snapshot_path)
+        self.path = journal_path
+        self.max_bytes = max_bytes
+        self._size = os.path.getsize(journal_path) if os.path.exists(journal_path) else 0
+        self._state = {}
+        self._retry = ""
+        self.compactions = 0
+
+    def _state_row(self, p):
+        return {f: json.dumps(getattr(p, f), sort_keys=True) for f in STATE_FIELDS}
+
+    def load(self, names):
+        players = self.base.load(names)
+        replayed = 0
+        good_offset = 0
+        if os.path.exists(self.path):
+            with open(self.path, "rb") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # Dernière ligne tronquée par un crash : on s'arrête là
+                        print(f"Journal {self.path} : ligne corrompue à l'offset {good_offset}, fin du replay")
+                        break
+                    good_offset += len(line)
+                    name = record.get("p")
+                    if name not in names: continue
+                    if name not in players: players[name] = Player(name)
+                    _apply_record(players[name], record)
+                    replayed += 1
+            if good_offset != self._size:
+                with open(self.path, "r+b") as f: f.truncate(good_offset)
+                self._size = good_offset
+        for name, p in players.items():
+            p.dirty = False
+            self._state[name] = self._state_row(p)
+        if replayed: print(f"Journal : {replayed} enregistrements rejoués")
+        return players
+
+    def snapshot(self, players, dirty):
+        # Sur l'event loop : uniquement ce qui a changé depuis la dernière écriture
+        now = int(time.time())
+        lines = []
+        for name in dirty:
+            p = players[name]
+            if p.pending_games:
+                lines.append(json.dumps({"t": "games", "p": name, "g": [g.to_row() for g in p.pending_games]}))
+                p.pending_games = []
+            row = self._state_row(p)
+            old = self._state.get(name, {})
+            changed = {f: getattr(p, f) for f, v in row.items() if old.get(f) != v}
+            if "ewgf_rank" in changed or "rating_mu" in changed:
+                lines.append(json.dumps({"t": "rank", "p": name, "ts": now, "rank": p.ewgf_rank, "rating_mu": p.rating_mu}))
+            if changed:
+                lines.append(json.dumps({"t": "state", "p": name, "s": changed}))
+            self._state[name] = row
+        self.base.invalidate(dirty)
+        text = self._retry + "".join(f"{line}\n" for line in lines)
+        self._retry = ""
+        compact = None
+        if self._size + len(text) > self.max_bytes:
+            compact = self.base.snapshot(players, set())
+        return text, compact
+
+    def write(self, batch):
+        # Hors event loop : append + fsync, ou snapshot complet puis journal vidé
+        text, compact = batch
+        if compact is not None:
+            self.base.write(compact)
+            atomic_write(self.path, "")
+            self._size = 0
+            self.compactions += 1
+            return
+        if not text: return
+        with open(self.path, "a") as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        self._size += len(text.encode())
+
+    def invalidate(self, names):
+        self.base.invalidate(names)
+        for name in names: self._state.pop(name, None)
+
+    def restore(self, batch, players):
+        # Lignes non écrites : remises en tête du prochain append
+        self._retry = batch[0] + self._retry
+
+    def save(self, players):
+        self.write(self.snapshot(players, set(players)))
+
+    def close(self):
+        pass
+
+
+def _apply_record(p, record):
+    kind = record.get("t")
+    if kind == "games":
+        # Dédupliqué par uid ; mis de côté tant que l'historique n'est pas chargé
+        p.restore_games([g for g in map(load_game, record.get("g", [])) if g is not None])
+    elif kind == "rank":
+        p.ewgf_rank = record.get("rank")
+        p.rating_mu = record.get("rating_mu")
+    elif kind == "state":
+        for f, v in record.get("s", {}).items():
+            if f in STATE_FIELDS: setattr(p, f, v)
+
+
+class SqliteStore:
+    def __init__(self, path):
+        self.path = path
+        # La connexion est utilisée depuis le thread d'écriture (to_thread) : accès sérialisés par le lock
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(players)")}
+        for f in DERIVED_FIELDS:
+            # Base créée avant les compteurs : recalculés depuis la table games au chargement
+            if f not in columns: self.conn.execute(f"ALTER TABLE players ADD COLUMN {f} TEXT")
+        # Dernière version écrite de chaque ligne : on ne réécrit que ce qui a changé
+        self._player_rows = {}
+        self._report_rows = {}
+        self._last_rank = {}
+        # Matchs retirés de pending_games par snapshot() mais pas encore en base (write() en cours dans un thread)
+        self._in_flight = []
+
+    def is_empty(self):
+        return self.conn.execute("SELECT 1 FROM players LIMIT 1").fetchone() is None
+
+    def _player_row(self, p):
+        return (tuple(getattr(p, f) for f in PLAYER_FIELDS) + tuple(json.dumps(getattr(p, f), sort_keys=True) for f in PLAYER_JSON_FIELDS)
+                + tuple(json.dumps(getattr(p, f).to_dict()) for f in DERIVED_FIELDS))
+
+    def _report_row(self, p):
+        return (
+            (p.last_daily_report_date, json.dumps(p.daily_snapshot, sort_keys=True)),
+            (p.last_weekly_report_date, json.dumps(p.weekly_snapshot, sort_keys=True)),
+        )
+
+    def load(self, names):
+        players = {}
+        cols = ", ".join(("name",) + PLAYER_FIELDS + PLAYER_JSON_FIELDS + tuple(DERIVED_FIELDS))
+        for row in self.conn.execute(f"SELECT {cols} FROM players"):
+            name = row[0]
+            if name not in names: continue
+            p = Player(name)
+            for field, value in zip(PLAYER_FIELDS, row[1:]):
+                setattr(p, field, value)
+            for field, value in zip(PLAYER_JSON_FIELDS, row[1 + len(PLAYER_FIELDS):]):
+                setattr(p, field, json.loads(value))
+            for (field, cls), value in zip(DERIVED_FIELDS.items(), row[-len(DERIVED_FIELDS):]):
+                if value:
+                    setattr(p, field, cls.from_dict(json.loads(value)))
+                    continue
+                # Tous les matchs de la base, pas seulement les MAX_GAMES gardés en mémoire (lus par morceaux)
+                setattr(p, field, cls.from_games(self.iter_games(name)))
+
+            # La base a déjà tous les matchs écrits : pas de liste lazy gardée en mémoire
+            p.set_history_loader(lambda name=name: self._load_history(name), keep_lazy_games=False)
+            # Index de dédup : seulement les uids de la fenêtre récente (index player + timestamp)
+            max_ts = self.conn.execute("SELECT MAX(timestamp_unix) FROM games WHERE player = ?", (name,)).fetchone()[0]
+            if max_ts:
+                p.dedup.max_ts = max_ts
+                for uid, ts in self.conn.execute(
+                    "SELECT uid, timestamp_unix FROM games WHERE player = ? AND timestamp_unix >= ?", (name, p.dedup.floor)
+                ):
+                    p.dedup.add_uid(uid, ts)
+
+            for kind, date, snapshot in self.conn.execute(
+                "SELECT kind, last_report_date, snapshot FROM report_state WHERE player = ?", (name,)
+            ):
+                setattr(p, f"last_{kind}_report_date", date)
+                setattr(p, f"{kind}_snapshot", json.loads(snapshot))
+
+            last = self.conn.execute(
+                "SELECT rank, rating_mu FROM rank_snapshots WHERE player = ? ORDER BY ts DESC LIMIT 1", (name,)
+            ).fetchone()
+            if last: self._last_rank[name] = last
+            self._player_rows[name] = self._player_row(p)
+            self._report_rows[name] = self._report_row(p)
+            p.dirty = False
+            players[name] = p
+        return players
+
+    def _load_history(self, name):
+        game_cols = ", ".join(GAME_FIELDS)
+        with self._lock:
+            rows = self.conn.execute(
+                f"SELECT {game_cols} FROM games WHERE player = ? ORDER BY timestamp_unix DESC LIMIT ?", (name, MAX_GAMES)
+            ).fetchall()
+            # Matchs d'un write() en cours : pas encore visibles dans la base
+            unwritten = [g for pending in self._in_flight for g in pending.get(name, ())]
+        # Lignes illisibles ignorées, comme JsonStore (load_history_dict)
+        games = [g for g in map(_game_from_row, rows) if g is not None]
+        if len(games) != len(rows): print(f"Base {name} : {len(rows) - len(games)} match(s) invalide(s) ignoré(s)")
+        if unwritten:
+            seen = {g.uid for g in games}
+            games = sorted(games + [g for g in unwritten if g.uid not in seen], key=lambda g: g.timestamp_unix, reverse=True)[:MAX_GAMES]
+        return games
+
+    # --- Historique complet (backfill) : lu et écrit par morceaux, jamais entièrement en mémoire ---
+    def iter_games(self, name, chunk=1000):
+        # Tous les matchs du joueur, du plus ancien au plus récent, lus par paquets (index player + timestamp)
+        game_cols = ", ".join(GAME_FIELDS)
+        last = (-1, 0)
+        while True:
+            with self._lock:
+                rows = self.conn.execute(
+                    f"SELECT timestamp_unix, id, {game_cols} FROM games WHERE player = ? AND (timestamp_unix, id) > (?, ?) "
+                    f"ORDER BY timestamp_unix, id LIMIT ?", (name,) + last + (chunk,)
+                ).fetchall()
+            if not rows: return
+            last = rows[-1][:2]
+            for r in rows:
+                g = _game_from_row(r[2:])
+                if g is not None: yield g
+
+    def games_between(self, name, start_ts, end_ts):
+        game_cols = ", ".join(GAME_FIELDS)
+        with self._lock:
+            rows = self.conn.execute(
+                f"SELECT {game_cols} FROM games WHERE player = ? AND timestamp_unix BETWEEN ? AND ?", (name, start_ts, end_ts)
+            ).fetchall()
+        return [g for g in map(_game_from_row, rows) if g is not None]
+
+    def add_history(self, name, games):
+        # Matchs anciens : directement en base (hors historique en mémoire) ; renvoie le nombre ajouté
+        with self._lock, self.conn:
+            before = self.conn.total_changes
+            self.conn.executemany(
+                f"INSERT OR IGNORE INTO games (player, uid, {', '.join(GAME_FIELDS)}) VALUES (?, ?{', ?' * len(GAME_FIELDS)})",
+                [(name, g.uid) + tuple(g.get(f) for f in GAME_FIELDS) for g in games],
+            )
+            return self.conn.total_changes - before
+
+    def snapshot(self, players, dirty):
+        # Sur l'event loop : calcule uniquement les lignes qui ont changé depuis la dernière écriture
+        now = int(time.time())
+        batch = {"players": [], "games": [], "ranks": [], "reports": [], "pending": {}}
+        for name in dirty:
+            p = players[name]
+            row = self._player_row(p)
+            if self._player_rows.get(name) != row:
+                batch["players"].append((name,) + row)
+                self._player_rows[name] = row
+
+            if p.pending_games:
+                batch["games"].extend((name, g.uid) + tuple(g.get(f) for f in GAME_FIELDS) for g in p.pending_games)
+                batch["pending"][name] = p.pending_games
+                p.pending_games = []
+
+            rank = (p.ewgf_rank, p.rating_mu)
+            if p.ewgf_rank and self._last_rank.get(name) != rank:
+                batch["ranks"].append((name, now) + rank)
+                self._last_rank[name] = rank
+
+            report = self._report_row(p)
+            if self._report_rows.get(name) != report:
+                batch["reports"].extend([(name, "daily") + report[0], (name, "weekly") + report[1]])
+                self._report_rows[name] = report
+        if batch["pending"]:
+            with self._lock: self._in_flight.append(batch["pending"])
+        return batch
+
+    def write(self, batch):
+        # Hors event loop : une seule transaction
+        cols = PLAYER_FIELDS + PLAYER_JSON_FIELDS + tuple(DERIVED_FIELDS)
+        with self._lock:
+            try:
+                with self.conn:
+                    self.conn.executemany(
+                        f"INSERT INTO players (name, {', '.join(cols)}) VALUES (?{', ?' * len(cols)}) "
+                        f"ON CONFLICT(name) DO UPDATE SET {', '.join(f'{c} = excluded.{c}' for c in cols)}",
+                        batch["players"],
+                    )
+                    self.conn.executemany(
+                        f"INSERT OR IGNORE INTO games (player, uid, {', '.join(GAME_FIELDS)}) VALUES (?, ?{', ?' * len(GAME_FIELDS)})",
+                        batch["games"],
+                    )
+                    self.conn.executemany("INSERT INTO rank_snapshots (player, ts, rank, rating_mu) VALUES (?, ?, ?, ?)", batch["ranks"])
+                    self.conn.executemany(
+                        "INSERT OR REPLACE INTO report_state (player, kind, last_report_date, snapshot) VALUES (?, ?, ?, ?)",
+                        batch["reports"],
+                    )
+            finally:
+                # En base, ou rendus à pending_games par restore() en cas d'échec : plus en transit
+                self._in_flight = [b for b in self._in_flight if b is not batch["pending"]]
+
+    def invalidate(self, names):
+        for name in names: self._fragments.pop(name, None)
+
+    def restore(self, batch, players):
+        # Le prochain snapshot réécrit tout le fichier : rien à remettre en file
+        pass
+
+    def save(self, players):
+        self.write(self.snapshot(players, set(players)))
+
+    def close(self):
+        pass
+
+
+class JournalStore:
+    # cache.json sert de snapshot ; les nouveaux matchs, changements de rang et champs modifiés
+    # sont ajoutés en fin de journal (une ligne JSON par enregistrement). Au-delà de max_bytes,
+    # un snapshot complet est réécrit et le journal repart de zéro.
+    # Rejouer un journal déjà inclus dans le snapshot ne change rien (matchs dédupliqués par uid,
+    # champs écrasés par leur dernière valeur) : un crash pendant la compaction est sans danger.
+    def __init__(self, snapshot_path, journal_path, max_bytes=4 * 2**20):
+        self.base = JsonStore(snapshot_path)
+        self.path = journal_path
+        self.max_bytes = max_bytes
+        self._size = os.path.getsize(journal_path) if os.path.exists(journal_path) else 0
+        self._state = {}
+        self._retry = ""
+        self.compactions = 0
+
+    def _state_row(self, p):
+        return {f: json.dumps(getattr(p, f), sort_keys=True) for f in STATE_FIELDS}
+
+    def load(self, names):
+        players = self.base.load(names)
+        replayed = 0
+        good_offset = 0
+        if os.path.exists(self.path):
+            with open(self.path, "rb") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # Dernière ligne tronquée par un crash : on s'arrête là
+                        print(f"Journal {self.path} : ligne corrompue à l'offset {good_offset}, fin du replay")
+                        break
+                    good_offset += len(line)
+                    name = record.get("p")
+                    if name not in names: continue
+                    if name not in players: players[name] = Player(name)
+                    _apply_record(players[name], record)
+                    replayed += 1
+            if good_offset != self._size:
+                with open(self.path, "r+b") as f: f.truncate(good_offset)
+                self._size = good_offset
+        for name, p in players.items():
+            p.dirty = False
+            self._state[name] = self._state_row(p)
+        if replayed: print(f"Journal : {replayed} enregistrements rejoués")
+        return players
+
+    def snapshot(self, players, dirty):
+        # Sur l'event loop : uniquement ce qui a changé depuis la dernière écriture
+        now = int(time.time())
+        lines = []
+        for name in dirty:
+            p = players[name]
+            if p.pending_games:
+                lines.append(json.dumps({"t": "games", "p": name, "g": [g.to_row() for g in p.pending_games]}))
+                p.pending_games = []
+            row = self._state_row(p)
+            old = self._state.get(name, {})
+            changed = {f: getattr(p, f) for f, v in row.items() if old.get(f) != v}
+            if "ewgf_rank" in changed or "rating_mu" in changed:
+                lines.append(json.dumps({"t": "rank", "p": name, "ts": now, "rank": p.ewgf_rank, "rating_mu": p.rating_mu}))
+            if changed:
+                lines.append(json.dumps({"t": "state", "p": name, "s": changed}))
+            self._state[name] = row
+        self.base.invalidate(dirty)
+        text = self._retry + "".join(f"{line}\n" for line in lines)
+        self._retry = ""
+        compact = None
+        if self._size + len(text) > self.max_bytes:
+            compact = self.base.snapshot(players, set())
+        return text, compact
+
+    def write(self, batch):
+        # Hors event loop : append + fsync, ou snapshot complet puis journal vidé
+        text, compact = batch
+        if compact is not None:
+            self.base.write(compact)
+            atomic_write(self.path, "")
+            self._size = 0
+            self.compactions += 1
+            return
+        if not text: return
+        with open(self.path, "a") as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        self._size += len(text.encode())
+
+    def invalidate(self, names):
+        self.base.invalidate(names)
+        for name in names: self._state.pop(name, None)
+
+    def restore(self, batch, players):
+        # Lignes non écrites : remises en tête du prochain append
+        self._retry = batch[0] + self._retry
+
+    def save(self, players):
+        self.write(self.snapshot(players, set(players)))
+
+    def close(self):
+        pass
+
+
+def _apply_record(p, record):
+    kind = record.get("t")
+    if kind == "games":
+        # Dédupliqué par uid ; mis de côté tant que l'historique n'est pas chargé
+        p.restore_games([g for g in map(load_game, record.get("g", [])) if g is not None])
+    elif kind == "rank":
+        p.ewgf_rank = record.get("rank")
+        p.rating_mu = record.get("rating_mu")
+    elif kind == "state":
+        for f, v in record.get("s", {}).items():
+            if f in STATE_FIELDS: setattr(p, f, v)
+
+
+class SqliteStore:
+    def __init__(self, path):
+        self.path = path
+        # La connexion est utilisée depuis le thread d'écriture (to_thread) : accès sérialisés par le lock
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(players)")}
+        for f in DERIVED_FIELDS:
+            # Base créée avant les compteurs : recalculés depuis la table games au chargement
+            if f not in columns: self.conn.execute(f"ALTER TABLE players ADD COLUMN {f} TEXT")
+        # Dernière version écrite de chaque ligne : on ne réécrit que ce qui a changé
+        self._player_rows = {}
+        self._report_rows = {}
+        self._last_rank = {}
+        # Matchs retirés de pending_games par snapshot() mais pas encore en base (write() en cours dans un thread)
+        self._in_flight = []
+
+    def is_empty(self):
+        return self.conn.execute("SELECT 1 FROM players LIMIT 1").fetchone() is None
+
+    def _player_row(self, p):
+        return (tuple(getattr(p, f) for f in PLAYER_FIELDS) + tuple(json.dumps(getattr(p, f), sort_keys=True) for f in PLAYER_JSON_FIELDS)
+                + tuple(json.dumps(getattr(p, f).to_dict()) for f in DERIVED_FIELDS))
+
+    def _report_row(self, p):
+        return (
+            (p.last_daily_report_date, json.dumps(p.daily_snapshot, sort_keys=True)),
+            (p.last_weekly_report_date, json.dumps(p.weekly_snapshot, sort_keys=True)),
+        )
+
+    def load(self, names):
+        players = {}
+        cols = ", ".join(("name",) + PLAYER_FIELDS + PLAYER_JSON_FIELDS + tuple(DERIVED_FIELDS))
+        for row in self.conn.execute(f"SELECT {cols} FROM players"):
+            name = row[0]
+            if name not in names: continue
+            p = Player(name)
+            for field, value in zip(PLAYER_FIELDS, row[1:]):
+                setattr(p, field, value)
+            for field, value in zip(PLAYER_JSON_FIELDS, row[1 + len(PLAYER_FIELDS):]):
+                setattr(p, field, json.loads(value))
+            for (field, cls), value in zip(DERIVED_FIELDS.items(), row[-len(DERIVED_FIELDS):]):
+                if value:
+                    setattr(p, field, cls.from_dict(json.loads(value)))
+                    continue
+                # Tous les matchs de la base, pas seulement les MAX_GAMES gardés en mémoire (lus par morceaux)
+                setattr(p, field, cls.from_games(self.iter_games(name)))
+
+            # La base a déjà tous les matchs écrits : pas de liste lazy gardée en mémoire
+            p.set_history_loader(lambda name=name: self._load_history(name), keep_lazy_games=False)
+            # Index de dédup : seulement les uids de la fenêtre récente (index player + timestamp)
+            max_ts = self.conn.execute("SELECT MAX(timestamp_unix) FROM games WHERE player = ?", (name,)).fetchone()[0]
+            if max_ts:
+                p.dedup.max_ts = max_ts
+                for uid, ts in self.conn.execute(
+                    "SELECT uid, timestamp_unix FROM games WHERE player = ? AND timestamp_unix >= ?", (name, p.dedup.floor)
+                ):
+                    p.dedup.add_uid(uid, ts)
+
+            for kind, date, snapshot in self.conn.execute(
+                "SELECT kind, last_report_date, snapshot FROM report_state WHERE player = ?", (name,)
+            ):
+                setattr(p, f"last_{kind}_report_date", date)
+                setattr(p, f"{kind}_snapshot", json.loads(snapshot))
+
+            last = self.conn.execute(
+                "SELECT rank, rating_mu FROM rank_snapshots WHERE player = ? ORDER BY ts DESC LIMIT 1", (name,)
+            ).fetchone()
+            if last: self._last_rank[name] = last
+            self._player_rows[name] = self._player_row(p)
+            self._report_rows[name] = self._report_row(p)
+            p.dirty = False
+            players[name] = p
+        return players
+
+    def _load_history(self, name):
+        game_cols = ", ".join(GAME_FIELDS)
+        with self._lock:
+            rows = self.conn.execute(
+                f"SELECT {game_cols} FROM games WHERE player = ? ORDER BY timestamp_unix DESC LIMIT ?", (name, MAX_GAMES)
+            ).fetchall()
+            # Matchs d'un write() en cours : pas encore visibles dans la base
+            unwritten = [g for pending in self._in_flight for g in pending.get(name, ())]
+        # Lignes illisibles ignorées, comme JsonStore (load_history_dict)
+        games = [g for g in map(_game_from_row, rows) if g is not None]
+        if len(games) != len(rows): print(f"Base {name} : {len(rows) - len(games)} match(s) invalide(s) ignoré(s)")
+        if unwritten:
+            seen = {g.uid for g in games}
+            games = sorted(games + [g for g in unwritten if g.uid not in seen], key=lambda g: g.timestamp_unix, reverse=True)[:MAX_GAMES]
+        return games
+
+    # --- Historique complet (backfill) : lu et écrit par morceaux, jamais entièrement en mémoire ---
+    def iter_games(self, name, chunk=1000):
+        # Tous les matchs du joueur, du plus ancien au plus récent, lus par paquets (index player + timestamp)
+        game_cols = ", ".join(GAME_FIELDS)
+        last = (-1, 0)
+        while True:
+            with self._lock:
+                rows = self.conn.execute(
+                    f"SELECT timestamp_unix, id, {game_cols} FROM games WHERE player = ? AND (timestamp_unix, id) > (?, ?) "
+                    f"ORDER BY timestamp_unix, id LIMIT ?", (name,) + last + (chunk,)
+                ).fetchall()
+            if not rows: return
+            last = rows[-1][:2]
+            for r in rows:
+                g = _game_from_row(r[2:])
+                if g is not None: yield g
+
+    def games_between(self, name, start_ts, end_ts):
+        game_cols = ", ".join(GAME_FIELDS)
+        with self._lock:
+            rows = self.conn.execute(
+                f"SELECT {game_cols} FROM games WHERE player = ? AND timestamp_unix BETWEEN ? AND ?", (name, start_ts, end_ts)
+            ).fetchall()
+        return [g for g in map(_game_from_row, rows) if g is not None]
+
+    def add_history(self, name, games):
+        # Matchs anciens : directement en base (hors historique en mémoire) ; renvoie le nombre ajouté
+        with self._lock, self.conn:
+            before = self.conn.total_changes
+            self.conn.executemany(
+                f"INSERT OR IGNORE INTO games (player, uid, {', '.join(GAME_FIELDS)}) VALUES (?, ?{', ?' * len(GAME_FIELDS)})",
+                [(name, g.uid) + tuple(g.get(f) for f in GAME_FIELDS) for g in games],
+            )
+            return self.conn.total_changes - before
+
+    def snapshot(self, players, dirty):
+        # Sur l'event loop : calcule uniquement les lignes qui ont changé depuis la dernière écriture
+        now = int(time.time())
+        batch = {"players": [], "games": [], "ranks": [], "reports": [], "pending": {}}
+        for name in dirty:
+            p = players[name]
+            row = self._player_row(p)
+            if self._player_rows.get(name) != row:
+                batch["players"].append((name,) + row)
+                self._player_rows[name] = row
+
+            if p.pending_games:
+                batch["games"].extend((name, g.uid) + tuple(g.get(f) for f in GAME_FIELDS) for g in p.pending_games)
+                batch["pending"][name] = p.pending_games
+                p.pending_games = []
+
+            rank = (p.ewgf_rank, p.rating_mu)
+            if p.ewgf_rank and self._last_rank.get(name) != rank:
+                batch["ranks"].append((name, now) + rank)
+                self._last_rank[name] = rank
+
+            report = self._report_row(p)
+            if self._report_rows.get(name) != report:
+                batch["reports"].extend([(name, "daily") + report[0], (name, "weekly") + report[1]])
+                self._report_rows[name] = report
+        if batch["pending"]:
+            with self._lock: self._in_flight.append(batch["pending"])
+        return batch
+
+    def write(self, batch):
+        # Hors event loop : une seule transaction
+        cols = PLAYER_FIELDS + PLAYER_JSON_FIELDS + tuple(DERIVED_FIELDS)
+        with self._lock, self.conn:
+            self.conn.executemany(
+                f"INSERT INTO players (name, {', '.join(cols)}) VALUES (?{', ?' * len(cols)}) "
+                f"ON CONFLICT(name) DO UPDATE SET {', '.join(f'{c} = excluded.{c}' for c in cols)}",
+                batch["players"],
+            )
+            self.conn.executemany(
+                f"INSERT OR IGNORE INTO games (player, uid, {', '.join(GAME_FIELDS)}) VALUES (?, ?{', ?' * len(GAME_FIELDS)})",
+                batch["games"],
+            )
+            self.conn.executemany("INSERT INTO rank_snapshots (player, ts, rank, rating_mu) VALUES (?, ?, ?, ?)", batch["ranks"])
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO report_state (player, kind, last_report_date, snapshot) VALUES (?, ?, ?, ?)",
+                batch["reports"],
+            )
+        # Écrits (ou rendus à pending_games par restore() en cas d'échec) : plus en transit
+        with self._lock:
+            if batch["pending"] in self._in_flight: self._in_flight.remove(batch["pending"])
+
+    def invalidate(self, names):
+        for name in names:
+            self._player_rows.pop(name, None)
+            self._report_rows.pop(name, None)
+            self._last_rank.pop(name, None)
+
+    def restore(self, batch, players):
+        for name, games in batch["pending"].items():
+            players[name].pending_games[:0] = games
+
+    def save(self, players):
+        self.write(self.snapshot(players, set(players)))
+
+    def close(self):
+        with self._lock: self.conn.close()
+
+
+def atomic_write(path, text):
+    # Fichier temporaire + rename : jamais de cache.json à moitié écrit en cas de crash
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def _game_from_row(row):
+    return load_game({f: v for f, v in zip(GAME_FIELDS, row) if v is not None})
+
+
+def migrate_json_cache(json_path, store):
+    # Import one-shot du cache.json existant dans la base SQLite
+    players = JsonStore(json_path).load(None)
+    for p in players.values():
+        p.pending_games = list(p.games)
+        p.dirty = True
+    store.save(players)
+    return players
+
+
+def open_store(backend, cache_file, db_file, journal_file=None, journal_max_bytes=4 * 2**20):
+    if backend == "json":
+        return JsonStore(cache_file)
+    if backend == "journal":
+        # cache.json existant = snapshot de départ, rien à migrer
+        return JournalStore(cache_file, journal_file or f"{os.path.splitext(cache_file)[0]}.journal.jsonl", journal_max_bytes)
+    if backend != "sqlite":
+        raise ValueError(f"STORAGE_BACKEND inconnu : {backend!r} (json, journal ou sqlite)")
+    store = SqliteStore(db_file)
+    if store.is_empty() and os.path.exists(cache_file):
+        players = migrate_json_cache(cache_file, store)
+        print(f"Migration {cache_file} -> {db_file} : {len(players)} joueurs, {sum(len(p.games) for p in players.values())} matchs")
+    return store
+
+
+if __name__ == "__main__":
+    # python storage.py data/cache.json data/tekken.db
+    if len(sys.argv) != 3:
+        sys.exit("usage: python storage.py <cache.json> <tekken.db>")
+    store = SqliteStore(sys.argv[2])
+    players = migrate_json_cache(sys.argv[1], store)
+    store.close()
+    print(f"{len(players)} joueurs, {sum(len(p.games) for p in players.values())} matchs migrés vers {sys.argv[2]}")